@@ -0,0 +1,90 @@
+"""Сборка статики: копии файлов с хэшем содержимого в имени и готовые .gz рядом.
+
+    python -m assets [каталог_статики]
+
+Шаблоны ссылаются на файлы через asset_url('js/main.js'). Собранные файлы отдаются
+с Cache-Control immutable; без сборки asset_url ведет на обычный /static/.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+
+from flask import request, send_from_directory, url_for
+
+SOURCE_PATTERNS = ('css/*.css', 'js/*.js')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def build(static_dir='static'):
+    """Собирает static/dist и манифест {исходный путь: путь с хэшем}"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    
+    manifest = {}
+    for pattern in SOURCE_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(static_dir, pattern))):
+            filename = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(filename)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            
+            target = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            # mtime=0: одинаковый .gz при одинаковом исходнике
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            manifest[filename] = hashed
+    
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def init_app(app):
+    """Маршрут /assets/ для собранных файлов и asset_url() в шаблонах"""
+    dist_dir = os.path.join(app.static_folder, DIST_DIR)
+    manifest = load_manifest(app.static_folder)
+    
+    def asset_url(filename):
+        hashed = manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('static_asset', filename=hashed)
+    
+    def static_asset(filename):
+        mimetype = mimetypes.guess_type(filename)[0]
+        precompressed = request.accept_encodings['gzip'] > 0 and os.path.exists(
+            os.path.join(dist_dir, filename + '.gz'))
+        response = send_from_directory(dist_dir, filename + '.gz' if precompressed else filename,
+                                       mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        if precompressed:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        # Имя меняется вместе с содержимым - файл можно не перепроверять
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    
+    app.add_url_rule('/assets/<path:filename>', 'static_asset', static_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+
+if __name__ == '__main__':
+    manifest = build(*sys.argv[1:2])
+    for filename, hashed in sorted(manifest.items()):
+        print(f'{filename} -> {DIST_DIR}/{hashed}')
@@ -1,54 +1,54 @@
-from functools import wraps
-from flask import session, redirect, url_for, flash
-import hashlib
-
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Пожалуйста, войдите в систему', 'error')
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def therapist_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Пожалуйста, войдите в систему', 'error')
-            return redirect(url_for('login'))
-        if session.get('role') != 'therapist':
-            flash('Доступ только для терапевтов', 'error')
-            return redirect(url_for('patient_dashboard'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def patient_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Пожалуйста, войдите в систему', 'error')
-            return redirect(url_for('login'))
-        if session.get('role') != 'patient':
-            flash('Доступ только для пациентов', 'error')
-            return redirect(url_for('therapist_dashboard'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def superadmin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Пожалуйста, войдите в систему', 'error')
-            return redirect(url_for('login'))
-        if session.get('role') != 'superadmin':
-            flash('Доступ только для администраторов', 'error')
-            return redirect(url_for('index'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password, password_hash):
-    return hash_password(password) == password_hash
\ No newline at end of file
+from functools import wraps
+from flask import session, redirect, url_for, flash
+from models import passwords
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Пожалуйста, войдите в систему', 'error')
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def therapist_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Пожалуйста, войдите в систему', 'error')
+            return redirect(url_for('login'))
+        if session.get('role') != 'therapist':
+            flash('Доступ только для терапевтов', 'error')
+            return redirect(url_for('patient_dashboard'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def patient_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Пожалуйста, войдите в систему', 'error')
+            return redirect(url_for('login'))
+        if session.get('role') != 'patient':
+            flash('Доступ только для пациентов', 'error')
+            return redirect(url_for('therapist_dashboard'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def superadmin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Пожалуйста, войдите в систему', 'error')
+            return redirect(url_for('login'))
+        if session.get('role') != 'superadmin':
+            flash('Доступ только для администраторов', 'error')
+            return redirect(url_for('index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def hash_password(password):
+    return passwords.hash_password(password)
+
+def verify_password(password, password_hash):
+    return passwords.verify_password(password, password_hash)
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""Замеры методов менеджеров и агрегатов DataManager на синтетических БД разных масштабов.
+
+    python -m benchmarks.data_layer [--scales small medium] [--rounds 5] [--threshold 0.25] [--save-baseline]
+
+БД масштабов (см. benchmarks.generate) создаются в data/benchmarks/ при первом запуске и
+переиспользуются. Медианы сравниваются с benchmarks/baselines.json: замедление больше порога
+считается регрессией, код выхода 1. Базовые значения зависят от машины - сохраняйте
+их (--save-baseline) там же, где сравниваете.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.generate import SCALES, generate
+from models.data_manager import DataManager
+from models.therapy_models import Session
+
+DATA_DIR = os.path.join('data', 'benchmarks')
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+SAMPLE_SIZE = 50          # пациентов и терапевтов, по которым идут вызовы
+MIN_ROUND_SECONDS = 0.1   # минимальная длительность одного раунда замера
+MIN_DELTA_MS = 0.01       # разница меньше этой - шум, а не регрессия
+
+
+def _sample(data_manager):
+    """Детерминированная выборка пациентов с сессиями и лицензированных терапевтов"""
+    with data_manager.db.connection() as conn:
+        patients = [row[0] for row in conn.execute('''
+            SELECT patient_id FROM sud_stats_patient WHERE session_count > 0 ORDER BY patient_id LIMIT ?
+        ''', (SAMPLE_SIZE,))]
+        therapists = [row[0] for row in conn.execute('''
+            SELECT therapist_id FROM therapist_licenses WHERE is_active = 1 ORDER BY therapist_id LIMIT ?
+        ''', (SAMPLE_SIZE,))]
+        usernames = [row[0] for row in conn.execute(
+            f'SELECT username FROM users WHERE user_id IN ({", ".join("?" * len(patients))})', patients
+        )]
+    return patients, therapists, usernames
+
+
+def _rolled_back(data_manager, action):
+    """Выполняет запись в транзакции, которая затем откатывается, - БД замера не меняется"""
+    with data_manager.db.connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            action()
+        finally:
+            conn.rollback()
+
+
+def build_cases(data_manager):
+    """[(имя, функция от номера вызова)]; номер перебирает выборку, чтобы не мерить одну строку"""
+    dm = data_manager
+    patients, therapists, usernames = _sample(dm)
+    patient = lambda i: patients[i % len(patients)]
+    therapist = lambda i: therapists[i % len(therapists)]
+    therapist_patients = {
+        therapist_id: [user.user_id for user in dm.user_manager.get_patients_by_therapist(therapist_id)]
+        for therapist_id in therapists
+    }
+    new_sessions = [
+        Session(f'BENCH_{index}', patients[0], '2030-01-01 10:00:00', 30, 'EMDR', 6, 3)
+        for index in range(100)
+    ]
+    
+    return [
+        ('users.get_user_by_id', lambda i: dm.user_manager.get_user_by_id(patient(i))),
+        ('users.get_user_by_username', lambda i: dm.user_manager.get_user_by_username(usernames[i % len(usernames)])),
+        ('users.get_patients_by_therapist', lambda i: dm.user_manager.get_patients_by_therapist(therapist(i))),
+        ('users.list_users', lambda i: dm.user_manager.list_users(role='patient', limit=50)),
+        ('users.count_users_by_role', lambda i: dm.user_manager.count_users_by_role()),
+        ('licenses.get_license', lambda i: dm.license_manager.get_license(therapist(i))),
+        ('licenses.get_licenses', lambda i: dm.license_manager.get_licenses(therapists)),
+        ('sessions.get_sessions_by_patient', lambda i: dm.therapy_manager.get_sessions_by_patient(patient(i))),
+        ('sessions.get_recent_sessions', lambda i: dm.therapy_manager.get_recent_sessions(patient(i))),
+        ('sessions.get_sessions_page', lambda i: dm.therapy_manager.get_sessions_page(patient(i), limit=100)),
+        ('sessions.get_sessions_columns', lambda i: dm.therapy_manager.get_sessions_columns(patient(i), limit=100)),
+        ('sessions.get_sessions_for_patients',
+         lambda i: dm.therapy_manager.get_sessions_for_patients(therapist_patients[therapist(i)])),
+        ('sessions.get_patient_preferences', lambda i: dm.therapy_manager.get_patient_preferences(patient(i))),
+        ('sessions.get_patient_version', lambda i: dm.therapy_manager.get_patient_version(patient(i))),
+        ('sessions.add_sessions_100',
+         lambda i: _rolled_back(dm, lambda: dm.therapy_manager.add_sessions(new_sessions))),
+        ('sud_stats.get_patient_stats', lambda i: dm.sud_stats.get_patient_stats(patient(i))),
+        ('sud_stats.get_therapist_stats', lambda i: dm.sud_stats.get_therapist_stats(therapist(i))),
+        ('sud_stats.get_module_stats', lambda i: dm.sud_stats.get_module_stats()),
+        ('sud_stats.get_overall_stats', lambda i: dm.sud_stats.get_overall_stats()),
+        ('tests.get_test_questions', lambda i: dm.test_manager.get_test_questions()),
+        ('recommendations.get_recommendations',
+         lambda i: dm.recommendations.get_recommendations(therapist_patients[therapist(i)])),
+        ('analytics.report', lambda i: dm.analytics.report(therapist(i))),
+        ('dashboards.get_patient_summary', lambda i: dm.dashboards.get_patient_summary(patient(i))),
+        ('dashboards.get_therapist_panel', lambda i: dm.dashboards.get_therapist_panel(therapist(i))),
+        ('data_manager.get_patient_with_sessions', lambda i: dm.get_patient_with_sessions(patient(i))),
+        ('data_manager.get_patients_by_therapist_id', lambda i: dm.get_patients_by_therapist_id(therapist(i))),
+        ('data_manager.calculate_average_sud_reduction', lambda i: dm.calculate_average_sud_reduction(therapist(i))),
+        ('data_manager.calculate_average_sud_reduction_all', lambda i: dm.calculate_average_sud_reduction()),
+    ]
+
+
+def measure(function, rounds):
+    """Медиана времени одного вызова по раундам, мс.
+    
+    Прогрев - по вызову на каждый элемент выборки: ленивые кэши (рекомендации, аналитика)
+    заполняются до замера, и мерится повторное обращение.
+    """
+    for index in range(SAMPLE_SIZE):
+        function(index)
+    per_call = []
+    calls = SAMPLE_SIZE
+    for _ in range(rounds):
+        round_calls = 0
+        started = time.perf_counter()
+        while True:
+            function(calls)
+            calls += 1
+            round_calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= MIN_ROUND_SECONDS:
+                break
+        per_call.append(elapsed * 1000 / round_calls)
+    return statistics.median(per_call)
+
+
+def scale_db(scale):
+    path = os.path.join(DATA_DIR, f'{scale}.db')
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f'Генерация {path}: {SCALES[scale]}')
+        generate(path, **SCALES[scale])
+    return path
+
+
+def run_scale(scale, rounds, only=None):
+    # Кэши пользователей и лицензий выключены: замеряются запросы, а не попадания в кэш
+    data_manager = DataManager(scale_db(scale), user_cache_enabled=False, license_cache_size=0)
+    data_manager.db.ensure_schema()
+    try:
+        return {
+            name: measure(function, rounds)
+            for name, function in build_cases(data_manager)
+            if not only or any(part in name for part in only)
+        }
+    finally:
+        data_manager.write_queue.close()
+        data_manager.db.close_all()
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', choices=sorted(SCALES), default=['small', 'medium'])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.25, help='допустимое замедление, доля (0.25 = 25%%)')
+    parser.add_argument('--only', nargs='+', help='только замеры, имя которых содержит подстроку')
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты как базовые')
+    args = parser.parse_args()
+    
+    baselines = load_baselines()
+    regressions = []
+    for scale in args.scales:
+        results = run_scale(scale, args.rounds, args.only)
+        baseline = baselines.get(scale, {})
+        print(f'\nМасштаб {scale} {SCALES[scale]}')
+        print(f'{"замер":<48} {"мс":>10} {"база, мс":>10} {"изменение":>10}')
+        for name, value in results.items():
+            base = baseline.get(name)
+            change = ''
+            if base:
+                change = f'{(value / base - 1) * 100:+.1f}%'
+                if value > base * (1 + args.threshold) and value - base > MIN_DELTA_MS:
+                    regressions.append((scale, name, base, value))
+                    change += ' !'
+            base_text = f'{base:10.3f}' if base else f'{"-":>10}'
+            print(f'{name:<48} {value:10.3f} {base_text} {change:>10}')
+        if args.save_baseline:
+            baselines.setdefault(scale, {}).update({name: round(value, 4) for name, value in results.items()})
+    
+    if args.save_baseline:
+        with open(BASELINES_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write('\n')
+        print(f'\nБазовые значения сохранены в {BASELINES_PATH}')
+    elif regressions:
+        print(f'\nРегрессии (порог {args.threshold:.0%}):')
+        for scale, name, base, value in regressions:
+            print(f'  {scale} {name}: {base:.3f} -> {value:.3f} мс')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
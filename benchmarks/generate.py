@@ -0,0 +1,188 @@
+"""Синтетическая БД заданного масштаба для замеров слоя данных.
+
+Схема - текущие миграции (включая демо-данные), поверх добавляются терапевты, пациенты,
+лицензии и сессии. Распределения приближены к живым данным: число сессий на пациента
+неравномерно, SUD снижается от сессии к сессии, модули - как в сценариях приложения.
+
+    python -m benchmarks.generate путь_к_бд [--therapists 1000] [--patients 100000] [--sessions 5000000]
+
+Триггеры сводок на therapy_sessions на время загрузки снимаются, сводки затем
+пересчитываются целиком - так загрузка миллионов строк занимает минуты, а не часы.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models import passwords
+from models.database import Database
+from models.patient_preferences import rebuild_preferences
+from models.sud_stats import rebuild_rollups
+from models.user_models import UserManager
+
+# Модули и доля сессий в каждом
+MODULES = (
+    ('360° Экспозиция', 0.40),
+    ('EMDR', 0.25),
+    ('Безопасное место - Море', 0.15),
+    ('Безопасное место - Лес', 0.12),
+    ('Безопасное место - Горы', 0.08),
+)
+# Пароль всех сгенерированных пользователей; хэш считается один раз
+PASSWORD = 'bench123'
+INSERT_BATCH_SIZE = 50000
+HISTORY_DAYS = 730
+
+SCALES = {
+    'small': {'therapists': 10, 'patients': 1000, 'sessions': 20000},
+    'medium': {'therapists': 100, 'patients': 10000, 'sessions': 300000},
+    'large': {'therapists': 1000, 'patients': 100000, 'sessions': 5000000},
+}
+
+
+def generate(db_path, therapists, patients, sessions, seed=42):
+    """Создает БД в db_path (файл не должен существовать). Возвращает число созданных сессий"""
+    if os.path.exists(db_path):
+        raise FileExistsError(db_path)
+    db = Database(db_path, pool_size=1)
+    db.init_database()
+    rng = np.random.default_rng(seed)
+    password_hash = passwords.hash_password(PASSWORD)
+    
+    with db.connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        user_manager = UserManager(db)
+        therapist_ids = [f'TH{number:03d}' for number in user_manager.allocate_ids('TH', therapists)]
+        patient_ids = [f'PT{number:03d}' for number in user_manager.allocate_ids('PT', patients)]
+        _insert_users(conn, therapist_ids, patient_ids, password_hash, rng)
+        _insert_licenses(conn, therapist_ids, rng)
+        
+        triggers = conn.execute('''
+            SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'therapy_sessions'
+        ''').fetchall()
+        for name, _ in triggers:
+            conn.execute(f'DROP TRIGGER {name}')
+        
+        created = _insert_sessions(conn, patient_ids, sessions, rng)
+        
+        for _, sql in triggers:
+            conn.execute(sql)
+        cursor = conn.cursor()
+        rebuild_rollups(cursor)
+        rebuild_preferences(cursor)
+        cursor.execute('''
+            INSERT INTO patient_versions (patient_id, version, updated_at)
+            SELECT patient_id, 1, CAST(strftime('%s', 'now') AS INTEGER) FROM therapy_sessions GROUP BY patient_id
+            ON CONFLICT (patient_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+        ''')
+    
+    with db.connection() as conn:
+        conn.execute('ANALYZE')
+    db.close_all()
+    return created
+
+
+def _insert_users(conn, therapist_ids, patient_ids, password_hash, rng):
+    conn.executemany('''
+        INSERT INTO users (user_id, username, password_hash, role, name)
+        VALUES (?, ?, ?, 'therapist', ?)
+    ''', [(user_id, f'gen_{user_id.lower()}', password_hash, f'Терапевт {user_id}') for user_id in therapist_ids])
+    
+    # Пациенты распределены по терапевтам неравномерно; ~5% неактивны
+    assigned = rng.choice(len(therapist_ids), size=len(patient_ids), p=_weights(len(therapist_ids), rng))
+    active = rng.random(len(patient_ids)) >= 0.05
+    conn.executemany('''
+        INSERT INTO users (user_id, username, password_hash, role, name, therapist_id, is_active)
+        VALUES (?, ?, ?, 'patient', ?, ?, ?)
+    ''', (
+        (user_id, f'gen_{user_id.lower()}', password_hash, f'Пациент {user_id}',
+         therapist_ids[therapist], int(is_active))
+        for user_id, therapist, is_active in zip(patient_ids, assigned.tolist(), active.tolist())
+    ))
+
+
+def _insert_licenses(conn, therapist_ids, rng):
+    now = datetime.now()
+    rows = []
+    for therapist_id, roll in zip(therapist_ids, rng.random(len(therapist_ids)).tolist()):
+        if roll < 0.7:
+            score = 80 + int(roll * 28)
+            rows.append((therapist_id, 'premium', 1, 1, score, now.isoformat(),
+                         (now + timedelta(days=30 + int(roll * 500))).isoformat()))
+        else:
+            rows.append((therapist_id, 'basic', 0, 0, 0, None, None))
+    conn.executemany('''
+        INSERT INTO therapist_licenses
+        (therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+
+def _weights(count, rng):
+    weights = rng.gamma(2.0, 1.0, size=count)
+    return weights / weights.sum()
+
+
+def _insert_sessions(conn, patient_ids, sessions, rng):
+    counts = rng.multinomial(sessions, _weights(len(patient_ids), rng))
+    module_names = [name for name, _ in MODULES]
+    module_weights = np.array([share for _, share in MODULES])
+    history_start = datetime.now() - timedelta(days=HISTORY_DAYS)
+    
+    created = 0
+    batch = []
+    for patient_id, count in zip(patient_ids, counts.tolist()):
+        if not count:
+            continue
+        # Начальный SUD 6-10, снижение к концу курса на 2-5 баллов
+        start_sud = rng.integers(6, 11)
+        trend = np.linspace(0, rng.uniform(2, 5), count)
+        pre_sud = np.clip(np.rint(start_sud - trend + rng.normal(0, 1, count)), 0, 10).astype(int)
+        post_sud = np.clip(pre_sud - rng.integers(0, 4, count), 0, 10)
+        durations = rng.integers(20, 61, count)
+        modules = rng.choice(len(module_names), size=count, p=module_weights)
+        offsets = np.sort(rng.uniform(0, HISTORY_DAYS * 86400, count))
+        
+        for index in range(count):
+            created += 1
+            date = history_start + timedelta(seconds=float(offsets[index]))
+            batch.append((f'GEN_{created:08d}', patient_id, date.strftime('%Y-%m-%d %H:%M:%S'),
+                          int(durations[index]), module_names[modules[index]],
+                          int(pre_sud[index]), int(post_sud[index])))
+        if len(batch) >= INSERT_BATCH_SIZE:
+            _flush_sessions(conn, batch)
+    _flush_sessions(conn, batch)
+    return created
+
+
+def _flush_sessions(conn, batch):
+    conn.executemany('''
+        INSERT INTO therapy_sessions (session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', batch)
+    batch.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('db_path')
+    parser.add_argument('--scale', choices=sorted(SCALES), help='готовый набор размеров')
+    parser.add_argument('--therapists', type=int, default=1000)
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--sessions', type=int, default=5000000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    sizes = SCALES[args.scale] if args.scale else {
+        'therapists': args.therapists, 'patients': args.patients, 'sessions': args.sessions
+    }
+    started = time.perf_counter()
+    created = generate(args.db_path, seed=args.seed, **sizes)
+    print(f"{args.db_path}: терапевтов {sizes['therapists']}, пациентов {sizes['patients']}, "
+          f"сессий {created} за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Накладные расходы учета SQL (models/query_stats.py) и метрик запросов.
+
+Два замера: одиночные SELECT напрямую через Database с учетом и без, и повторные
+запросы страницы пациента в отдельных интерпретаторах с VR_THERAPY_SQL_METRICS=0/1:
+
+    python -m benchmarks.instrumentation [--statements 20000] [--requests 300] [--runs 3]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from models import query_stats
+from models.database import Database
+
+SOURCE_DB = 'data/vr_therapy.db'
+
+# Выполняется в дочернем процессе; печатает среднее время запроса одной строкой JSON
+CHILD_SCRIPT = '''
+import json, sys, time
+from app import app
+
+client = app.test_client()
+client.post('/login', data={'username': 'licensed_doc', 'password': 'license123'})
+client.get('/patient/PT004')
+
+requests = int(sys.argv[1])
+started = time.perf_counter()
+for _ in range(requests):
+    client.get('/patient/PT004')
+print(json.dumps({'request_ms': (time.perf_counter() - started) * 1000 / requests}))
+'''
+
+
+def statement_us(db_path, instrument, statements):
+    """Среднее время SELECT по первичному ключу, мкс"""
+    db = Database(db_path, pool_size=1, instrument=instrument)
+    query_stats.start()
+    try:
+        with db.connection() as conn:
+            started = time.perf_counter()
+            for _ in range(statements):
+                cursor = conn.cursor()
+                cursor.execute('SELECT name, role FROM users WHERE user_id = ?', ('PT004',))
+                cursor.fetchone()
+            elapsed = time.perf_counter() - started
+    finally:
+        query_stats.stop()
+        db.close_all()
+    return elapsed * 1e6 / statements
+
+
+def request_ms(db_path, instrument, requests):
+    env = dict(os.environ, VR_THERAPY_DB=db_path, VR_THERAPY_SQL_METRICS='1' if instrument else '0')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, str(requests)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])['request_ms']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--statements', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'vr_therapy.db')
+        shutil.copy(SOURCE_DB, db_path)
+        # Первый прогон применяет миграции и не учитывается
+        request_ms(db_path, False, 1)
+        
+        results = {}
+        for instrument in (False, True):
+            results[instrument] = (
+                statistics.median(statement_us(db_path, instrument, args.statements) for _ in range(args.runs)),
+                statistics.median(request_ms(db_path, instrument, args.requests) for _ in range(args.runs)),
+            )
+    
+    print(f'Прогонов: {args.runs}, выражений: {args.statements}, запросов страницы: {args.requests}')
+    print(f'{"":>12} {"SELECT, мкс":>12} {"страница, мс":>13}')
+    for instrument, label in ((False, 'без учета'), (True, 'с учетом')):
+        statement, request = results[instrument]
+        print(f'{label:>12} {statement:12.2f} {request:13.3f}')
+    (base_statement, base_request), (statement, request) = results[False], results[True]
+    print(f'{"разница":>12} {statement - base_statement:+12.2f} {request - base_request:+13.3f}  '
+          f'({(request / base_request - 1) * 100:+.1f}% на страницу)')
+
+
+if __name__ == '__main__':
+    main()
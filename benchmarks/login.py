@@ -0,0 +1,98 @@
+"""Пропускная способность входа при разных размерах пула хэширования паролей.
+
+Для каждого размера пула - отдельный интерпретатор на копии демо-БД. Клиентские потоки
+непрерывно входят в систему, параллельно замеряется задержка легкого маршрута:
+
+    python -m benchmarks.login [--workers 1 2 4 8] [--clients 16] [--seconds 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SOURCE_DB = 'data/vr_therapy.db'
+
+# Выполняется в дочернем процессе; печатает замеры одной строкой JSON
+CHILD_SCRIPT = '''
+import json, statistics, sys, threading, time
+from app import app
+
+clients, seconds = int(sys.argv[1]), float(sys.argv[2])
+credentials = {'username': 'pt001234', 'password': 'pass123'}
+# Первый вход заменяет старый хэш демо-данных на scrypt
+app.test_client().post('/login', data=credentials)
+
+stop = threading.Event()
+statuses = {}
+lock = threading.Lock()
+
+def login_loop():
+    client = app.test_client()
+    while not stop.is_set():
+        status = client.post('/login', data=credentials).status_code
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+probe_ms = []
+def probe_loop():
+    client = app.test_client()
+    client.post('/login', data={'username': 'licensed_doc', 'password': 'license123'})
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get('/api/session/scenarios')
+        probe_ms.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.01)
+
+threads = [threading.Thread(target=login_loop) for _ in range(clients)]
+threads.append(threading.Thread(target=probe_loop))
+started = time.perf_counter()
+for thread in threads:
+    thread.start()
+time.sleep(seconds)
+stop.set()
+for thread in threads:
+    thread.join()
+elapsed = time.perf_counter() - started
+
+probe_ms.sort()
+print(json.dumps({
+    'logins_per_s': statuses.get(302, 0) / elapsed,
+    'rejected_per_s': statuses.get(503, 0) / elapsed,
+    'probe_p50_ms': statistics.median(probe_ms),
+    'probe_p95_ms': probe_ms[int(len(probe_ms) * 0.95)]
+}))
+'''
+
+
+def run_once(db_path, workers, clients, seconds):
+    env = dict(os.environ, VR_THERAPY_DB=db_path, VR_THERAPY_HASH_WORKERS=str(workers))
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, str(clients), str(seconds)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    
+    print(f'Ядер: {os.cpu_count()}, клиентов: {args.clients}, длительность: {args.seconds} с')
+    print(f'{"пул":>4} {"входов/с":>9} {"отказов/с":>10} {"p50, мс":>8} {"p95, мс":>8}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for workers in args.workers:
+            db_path = os.path.join(tmp_dir, f'vr_therapy_{workers}.db')
+            shutil.copy(SOURCE_DB, db_path)
+            result = run_once(db_path, workers, args.clients, args.seconds)
+            print(f'{workers:>4} {result["logins_per_s"]:>9.1f} {result["rejected_per_s"]:>10.1f} '
+                  f'{result["probe_p50_ms"]:>8.2f} {result["probe_p95_ms"]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Замер холодного старта: импорт app и первый запрос, затем стоимость повторного запроса.
+
+Каждый прогон - отдельный интерпретатор на копии демо-БД:
+
+    python -m benchmarks.startup [--runs 5] [--requests 200]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SOURCE_DB = 'data/vr_therapy.db'
+
+# Выполняется в дочернем процессе; печатает замеры одной строкой JSON
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+
+client = app.test_client()
+client.post('/login', data={'username': 'pt001234', 'password': 'pass123'})
+logged_in = time.perf_counter()
+client.get('/api/patient/PT001/sessions')
+first_request = time.perf_counter()
+
+requests = int(sys.argv[1])
+for _ in range(requests):
+    client.get('/api/patient/PT001/sessions')
+finished = time.perf_counter()
+
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'login_ms': (logged_in - imported) * 1000,
+    'first_request_ms': (first_request - logged_in) * 1000,
+    'warm_request_ms': (finished - first_request) * 1000 / max(requests, 1)
+}))
+'''
+
+
+def run_once(db_path, requests):
+    env = dict(os.environ, VR_THERAPY_DB=db_path)
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, str(requests)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'vr_therapy.db')
+        shutil.copy(SOURCE_DB, db_path)
+        # Первый прогон применяет миграции и не учитывается
+        run_once(db_path, 0)
+        results = [run_once(db_path, args.requests) for _ in range(args.runs)]
+    
+    print(f'Прогонов: {args.runs}, повторных запросов в прогоне: {args.requests}')
+    for metric in ('import_ms', 'login_ms', 'first_request_ms', 'warm_request_ms'):
+        values = [result[metric] for result in results]
+        print(f'{metric:>18}: медиана {statistics.median(values):8.2f}  '
+              f'мин {min(values):8.2f}  макс {max(values):8.2f}')
+
+
+if __name__ == '__main__':
+    main()
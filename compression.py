@@ -0,0 +1,45 @@
+"""Сжатие ответов (gzip/deflate) для HTML и JSON.
+
+Сжимаются только типы из COMPRESS_MIMETYPES размером от COMPRESS_MIN_SIZE байт.
+Потоковые ответы (SSE) и файлы статики не трогаются: статика отдается уже сжатой, см. assets.py.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+def init_app(app):
+    @app.after_request
+    def compress_response(response):
+        return _compress(response, app.config)
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    for encoding in ('gzip', 'deflate'):
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+def _compress(response, config):
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+    
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+    
+    if encoding == 'gzip':
+        compressed = gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+    else:
+        compressed = zlib.compress(data, config['COMPRESS_LEVEL'])
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -1,15 +1,59 @@
-import os
-from datetime import timedelta
-
-class Config:
-    SECRET_KEY = os.environ.get('AXL_WINNER') or 'dev-secret-key-change-in-production'
-    SESSION_TYPE = 'filesystem'
-    PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
-    
-    # Роли пользователей
-    USER_ROLES = {
-        'patient': 'patient',
-        'therapist': 'therapist', 
-        'admin': 'admin',
-        'superadmin': 'superadmin'
-    }
+import os
+from datetime import timedelta
+
+class Config:
+    SECRET_KEY = os.environ.get('AXL_WINNER') or 'dev-secret-key-change-in-production'
+    SESSION_TYPE = 'filesystem'
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
+    
+    # База данных
+    DATABASE_PATH = os.environ.get('VR_THERAPY_DB') or 'data/vr_therapy.db'
+    DATABASE_POOL_SIZE = int(os.environ.get('VR_THERAPY_DB_POOL_SIZE', 8))
+    
+    # Кэш пользователей (UserManager)
+    USER_CACHE_ENABLED = os.environ.get('VR_THERAPY_USER_CACHE', '1') != '0'
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 300  # секунд
+    
+    # Хэширование паролей (scrypt): потоков в пуле и мест в очереди ожидания
+    PASSWORD_HASH_WORKERS = int(os.environ.get('VR_THERAPY_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = 32
+    
+    # Активные сессии и симуляции (в cookie хранится только id)
+    LIVE_SESSION_TTL = 4 * 3600  # секунд без изменений до удаления
+    LIVE_SESSION_PERSIST = os.environ.get('VR_THERAPY_LIVE_SESSIONS_DB', '0') == '1'
+    WRITE_BATCH_INTERVAL = 0.2  # секунд между групповыми записями SUD
+    
+    # Постраничный вывод (админ-панель и история сессий в API)
+    USERS_PAGE_SIZE = 50
+    SESSIONS_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 500
+    
+    # Метрики (/admin/metrics): учет SQL на запрос и заголовки X-Query-Count / Server-Timing в режиме отладки.
+    # Учет SQL по умолчанию выключен: каждое выражение идет через обертку курсора
+    SQL_INSTRUMENTATION = os.environ.get('VR_THERAPY_SQL_METRICS', '0') == '1'
+    QUERY_TIMING_HEADERS = True
+    # Журнал медленных SQL-выражений (/admin/slow-queries) с EXPLAIN QUERY PLAN; по умолчанию выключен
+    SLOW_QUERY_LOG = os.environ.get('VR_THERAPY_SLOW_QUERY_LOG', '0') == '1'
+    SLOW_QUERY_MS = float(os.environ.get('VR_THERAPY_SLOW_QUERY_MS', 100))  # порог, мс
+    
+    # Сжатие ответов (compression.py)
+    COMPRESS_MIN_SIZE = 1024  # байт; меньшие ответы отдаются как есть
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = ('text/html', 'application/json', 'text/css', 'application/javascript', 'text/plain')
+    
+    # Шаблоны: байткод-кэш Jinja (None - временный каталог пользователя) и кэш разметки (fragments.py)
+    JINJA_BYTECODE_CACHE = os.environ.get('VR_THERAPY_JINJA_CACHE', '1') != '0'
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('VR_THERAPY_JINJA_CACHE_DIR')
+    TEMPLATE_CACHE_SIZE = 4096  # фрагментов и страниц
+    
+    # Массовое создание пациентов
+    BULK_CREATE_MAX = 1000
+    
+    # Роли пользователей
+    USER_ROLES = {
+        'patient': 'patient',
+        'therapist': 'therapist', 
+        'admin': 'admin',
+        'superadmin': 'superadmin'
+    }
@@ -0,0 +1,41 @@
+"""Кэш отрендеренной разметки: фрагменты по ключу данных и статические страницы целиком.
+
+Скомпилированные шаблоны хранятся в байткод-кэше Jinja и переживают перезапуск процесса.
+"""
+from flask import render_template, session
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from models.cache import LRUCache
+
+# Поля cookie-сессии, от которых зависит шапка base.html
+NAVIGATION_KEYS = ('user_id', 'role', 'is_licensed', 'name', 'license_expires')
+
+class TemplateCache:
+    def __init__(self, maxsize=4096):
+        # Без TTL: ключ меняется вместе с данными, старые записи вытесняет LRU
+        self.entries = LRUCache(maxsize, ttl=None)
+    
+    def fragment(self, template_name, key, **context):
+        """Разметка шаблона для ключа key; шаблон рендерится только при промахе"""
+        cache_key = (template_name, key)
+        html = self.entries.get(cache_key)
+        if html is None:
+            html = Markup(render_template(template_name, **context))
+            self.entries.set(cache_key, html)
+        return html
+    
+    def page(self, template_name):
+        """Страница без данных: один рендер на каждый вариант шапки"""
+        # Флеш-сообщения выводятся один раз - такую страницу не кэшируем
+        if session.get('_flashes'):
+            return render_template(template_name)
+        navigation = tuple(session.get(key) for key in NAVIGATION_KEYS)
+        return self.fragment(template_name, ('page',) + navigation)
+
+def init_app(app):
+    if app.config['JINJA_BYTECODE_CACHE']:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+    template_cache = TemplateCache(app.config['TEMPLATE_CACHE_SIZE'])
+    app.jinja_env.globals['fragment'] = template_cache.fragment
+    return template_cache
@@ -0,0 +1,150 @@
+"""Метрики HTTP-запросов и SQL в текстовом формате Prometheus (маршрут /admin/metrics).
+
+На каждый запрос: задержка, статус, размер ответа (после сжатия) и учет SQL из
+models/query_stats.py. Учет SQL собирается, только если он включен (VR_THERAPY_SQL_METRICS=1
+или журнал медленных запросов); в режиме отладки ответ получает заголовки X-Query-Count и Server-Timing.
+"""
+import threading
+from time import perf_counter
+
+from flask import g, request
+
+from models import query_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}
+    
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+class Gauge(Counter):
+    def set_max(self, labels, value):
+        if value > self.values.get(labels, 0):
+            self.values[labels] = value
+    
+    def render(self):
+        lines = super().render()
+        lines[1] = f'# TYPE {self.name} gauge'
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.values = {}  # labels -> [счетчики по корзинам..., сумма, количество]
+    
+    def observe(self, labels, value):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        names = self.label_names + ('le',)
+        for labels, series in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_labels(names, labels + (bound,))} {count}')
+            lines.append(f'{self.name}_bucket{_labels(names, labels + ("+Inf",))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {series[-1]}')
+        return lines
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter('vr_http_requests_total', 'HTTP-запросы по маршруту, методу и статусу',
+                                ('endpoint', 'method', 'status'))
+        self.latency = Histogram('vr_http_request_duration_seconds', 'Время обработки запроса',
+                                 ('endpoint',), LATENCY_BUCKETS)
+        self.response_size = Histogram('vr_http_response_size_bytes', 'Размер тела ответа',
+                                       ('endpoint',), SIZE_BUCKETS)
+        self.queries = Histogram('vr_db_statements_per_request', 'SQL-выражений на запрос',
+                                 ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.query_time = Counter('vr_db_statement_seconds_total', 'Суммарное время SQL-выражений',
+                                  ('endpoint',))
+        self.slowest_query = Gauge('vr_db_slowest_statement_seconds', 'Самое медленное SQL-выражение',
+                                   ('endpoint',))
+    
+    def observe(self, endpoint, method, status, seconds, size, stats):
+        with self._lock:
+            self.requests.inc((endpoint, method, str(status)))
+            self.latency.observe((endpoint,), seconds)
+            if size is not None:
+                self.response_size.observe((endpoint,), size)
+            if stats is not None:
+                self.queries.observe((endpoint,), stats.count)
+                self.query_time.inc((endpoint,), stats.total_time)
+                self.slowest_query.set_max((endpoint,), stats.slowest_time)
+    
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.response_size,
+                           self.queries, self.query_time, self.slowest_query):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Регистрирует учет запросов; вызывать до остальных after_request, чтобы замер шел последним"""
+    metrics = RequestMetrics()
+    # Без обертки курсора (Database(instrument=False)) счетчики SQL остались бы нулевыми
+    sql_enabled = app.config['SQL_INSTRUMENTATION'] or app.config['SLOW_QUERY_LOG']
+    
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = perf_counter()
+        g.query_stats = query_stats.start(request.endpoint or 'unmatched') if sql_enabled else None
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed = perf_counter() - started
+        stats = g.get('query_stats')
+        size = None if response.is_streamed else response.calculate_content_length()
+        metrics.observe(request.endpoint or 'unmatched', request.method, response.status_code,
+                        elapsed, size, stats)
+        
+        if app.debug and app.config['QUERY_TIMING_HEADERS'] and stats is not None:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} SQL", '
+                f'db-slowest;dur={stats.slowest_time * 1000:.2f}, total;dur={elapsed * 1000:.2f}'
+            )
+        return response
+    
+    @app.teardown_request
+    def stop_request_metrics(exc):
+        query_stats.stop()
+    
+    return metrics
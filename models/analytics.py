@@ -0,0 +1,201 @@
+import threading
+
+import numpy as np
+
+# Юлианский день 1970-01-01: julianday(date) - UNIX_EPOCH_JD = дни от эпохи
+UNIX_EPOCH_JD = 2440587.5
+# 1970-01-01 - четверг; сдвиг, чтобы недели начинались с понедельника
+WEEK_OFFSET_DAYS = 3
+DURATION_BUCKET_MINUTES = 10
+
+class SessionFrame:
+    """Колонки therapy_sessions в массивах NumPy; пациенты и модули закодированы индексами в словари.
+    
+    Кадр неизменяем: новые сессии дают новый кадр через extended().
+    """
+    
+    def __init__(self, edits_version):
+        self.edits_version = edits_version
+        self.last_id = 0
+        self.patients, self.modules = [], []
+        self._patient_codes, self._module_codes = {}, {}
+        self.patient_idx = np.empty(0, dtype=np.int32)
+        self.module_idx = np.empty(0, dtype=np.int32)
+        self.day = np.empty(0, dtype=np.int32)
+        self.duration = np.empty(0, dtype=np.int32)
+        self.pre_sud = np.empty(0, dtype=np.float64)
+        self.post_sud = np.empty(0, dtype=np.float64)
+    
+    def __len__(self):
+        return len(self.duration)
+    
+    def extended(self, rows):
+        """Новый кадр с добавленными строками (id, patient_id, module_used, день, длительность, pre, post)"""
+        if not rows:
+            return self
+        frame = SessionFrame(self.edits_version)
+        ids, patient_ids, modules, days, durations, pre_suds, post_suds = zip(*rows)
+        frame.last_id = max(ids)
+        
+        frame._patient_codes, frame._module_codes = dict(self._patient_codes), dict(self._module_codes)
+        frame.patient_idx = np.concatenate([self.patient_idx, _encode(frame._patient_codes, patient_ids)])
+        frame.module_idx = np.concatenate([self.module_idx, _encode(frame._module_codes, modules)])
+        frame.patients, frame.modules = list(frame._patient_codes), list(frame._module_codes)
+        
+        frame.day = np.concatenate([self.day, np.array(days, dtype=np.int32)])
+        frame.duration = np.concatenate([self.duration, np.array(durations, dtype=np.int32)])
+        frame.pre_sud = np.concatenate([self.pre_sud, np.array(pre_suds, dtype=np.float64)])
+        frame.post_sud = np.concatenate([self.post_sud, np.array(post_suds, dtype=np.float64)])
+        return frame
+
+def _encode(codes, values):
+    """Индексы значений в словаре codes (новые значения дописываются)"""
+    return np.fromiter((codes.setdefault(value, len(codes)) for value in values),
+                       dtype=np.int32, count=len(values))
+
+def _grouped(key_name, labels, idx, pre_sud, post_sud):
+    """Средние SUD по группам; группы без сессий пропускаются"""
+    size = len(labels)
+    counts = np.bincount(idx, minlength=size)
+    sum_pre = np.bincount(idx, weights=pre_sud, minlength=size)
+    sum_post = np.bincount(idx, weights=post_sud, minlength=size)
+    result = []
+    for group in np.flatnonzero(counts):
+        count = counts[group]
+        result.append({
+            key_name: labels[group],
+            'session_count': int(count),
+            'avg_pre_sud': round(sum_pre[group] / count, 2),
+            'avg_post_sud': round(sum_post[group] / count, 2),
+            'avg_sud_reduction': round((sum_post[group] - sum_pre[group]) / count, 2)
+        })
+    return result
+
+class CohortAnalytics:
+    """Векторные агрегаты по истории сессий.
+    
+    Колонки загружаются один раз; дальше дочитываются только сессии с большим id.
+    Полная перезагрузка - только после UPDATE/DELETE в therapy_sessions (data_versions).
+    Снижение SUD, как и в остальной системе, считается как post - pre: отрицательное - улучшение.
+    """
+    
+    def __init__(self, db):
+        self.db = db
+        self._frame = None
+        self._therapists = None   # (версия привязок, число пациентов, терапевты, индекс терапевта по пациенту)
+        self._lock = threading.Lock()
+    
+    def get_frame(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM data_versions WHERE name = 'therapy_sessions_edits'")
+            row = cursor.fetchone()
+            edits_version = row[0] if row else 0
+            cursor.execute('SELECT MAX(id) FROM therapy_sessions')
+            last_id = cursor.fetchone()[0] or 0
+            
+            frame = self._frame
+            if frame is not None and frame.edits_version == edits_version and frame.last_id == last_id:
+                return frame
+            
+            with self._lock:
+                frame = self._frame
+                if frame is None or frame.edits_version != edits_version:
+                    frame = SessionFrame(edits_version)
+                if frame.last_id != last_id:
+                    cursor.execute('''
+                        SELECT id, patient_id, module_used, CAST(julianday(date) - ? AS INTEGER),
+                               duration_minutes, pre_sud, post_sud
+                        FROM therapy_sessions WHERE id > ?
+                    ''', (UNIX_EPOCH_JD, frame.last_id))
+                    frame = frame.extended(cursor.fetchall())
+                self._frame = frame
+                return frame
+    
+    def data_version(self):
+        """Ключ версии данных отчета для условных запросов: (правки, привязки, последний id сессии)"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT (SELECT version FROM data_versions WHERE name = 'therapy_sessions_edits'),
+                       (SELECT version FROM data_versions WHERE name = 'patient_assignments'),
+                       (SELECT MAX(id) FROM therapy_sessions)
+            ''')
+            return tuple(value or 0 for value in cursor.fetchone())
+    
+    def get_therapist_index(self, frame):
+        """(терапевты, индекс терапевта для каждой сессии кадра) по текущим привязкам пациентов"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM data_versions WHERE name = 'patient_assignments'")
+            row = cursor.fetchone()
+            version = row[0] if row else 0
+            
+            cached = self._therapists
+            if cached is None or cached[0] != version or cached[1] != len(frame.patients):
+                cursor.execute("SELECT user_id, therapist_id FROM users WHERE role = 'patient'")
+                assignments = dict(cursor.fetchall())
+                codes = {}
+                per_patient = _encode(codes, [assignments.get(patient_id) for patient_id in frame.patients])
+                cached = (version, len(frame.patients), list(codes), per_patient)
+                self._therapists = cached
+        
+        _, _, therapists, per_patient = cached
+        return therapists, per_patient[frame.patient_idx]
+    
+    def report(self, therapist_id=None):
+        """Снижение SUD по модулям, терапевтам и неделям и зависимость от длительности сессии"""
+        frame = self.get_frame()
+        therapists, therapist_idx = self.get_therapist_index(frame)
+        mask = None
+        if therapist_id is not None:
+            if therapist_id in therapists:
+                mask = therapist_idx == therapists.index(therapist_id)
+            else:
+                mask = np.zeros(len(frame), dtype=bool)
+        
+        def column(values):
+            return values if mask is None else values[mask]
+        
+        pre_sud, post_sud = column(frame.pre_sud), column(frame.post_sud)
+        return {
+            'session_count': int(len(pre_sud)),
+            'by_module': _grouped('module', frame.modules, column(frame.module_idx), pre_sud, post_sud),
+            'by_therapist': _grouped('therapist_id', therapists, column(therapist_idx), pre_sud, post_sud),
+            'by_week': self._by_week(column(frame.day), pre_sud, post_sud),
+            'dose_response': self._dose_response(column(frame.duration), pre_sud, post_sud)
+        }
+    
+    @staticmethod
+    def _by_week(day, pre_sud, post_sud):
+        if not len(day):
+            return []
+        week = (day + WEEK_OFFSET_DAYS) // 7
+        first_week = int(week.min())
+        week_idx = week - first_week
+        # Метка недели - дата ее понедельника
+        week_starts = (np.arange(int(week_idx.max()) + 1) + first_week) * 7 - WEEK_OFFSET_DAYS
+        labels = [str(np.datetime64(int(start), 'D')) for start in week_starts]
+        return _grouped('week_start', labels, week_idx, pre_sud, post_sud)
+    
+    @staticmethod
+    def _dose_response(duration, pre_sud, post_sud):
+        if not len(duration):
+            return {'buckets': [], 'slope_per_minute': None, 'correlation': None}
+        
+        bucket_idx = duration // DURATION_BUCKET_MINUTES
+        labels = [f'{bucket * DURATION_BUCKET_MINUTES}-{(bucket + 1) * DURATION_BUCKET_MINUTES - 1}'
+                  for bucket in range(int(bucket_idx.max()) + 1)]
+        buckets = _grouped('duration_minutes', labels, bucket_idx, pre_sud, post_sud)
+        
+        # Линейная зависимость снижения SUD от длительности (МНК)
+        reduction = post_sud - pre_sud
+        x = duration - duration.mean()
+        y = reduction - reduction.mean()
+        x_spread, y_spread = float(np.dot(x, x)), float(np.dot(y, y))
+        covariance = float(np.dot(x, y))
+        return {
+            'buckets': buckets,
+            'slope_per_minute': round(covariance / x_spread, 4) if x_spread else None,
+            'correlation': round(covariance / np.sqrt(x_spread * y_spread), 4) if x_spread and y_spread else None
+        }
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш с временем жизни записей и счетчиками попаданий"""
+    
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+    
+    def peek(self, key, default=None):
+        """Значение без учета в счетчиках и без продления в LRU (в том числе просроченное)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else default
+    
+    def set(self, key, value, expires_at=None):
+        """Сохраняет значение; expires_at (по часам кэша) сокращает TTL для отдельной записи"""
+        if self.ttl is not None:
+            ttl_expiry = self.clock() + self.ttl
+            expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
@@ -0,0 +1,97 @@
+"""Готовые данные для панелей (view models).
+
+Шаблоны панелей получают посчитанные значения и не обращаются к слою данных.
+Итоги по пациентам берутся из сводок SUD (models/sud_stats.py) одним запросом на пачку пациентов.
+"""
+from .therapy_models import PATIENT_BATCH_SIZE
+
+
+class PatientSummary:
+    """Итоги по сессиям пациента"""
+    
+    def __init__(self, session_count=0, sum_pre_sud=0, sum_post_sud=0, sum_duration=0,
+                 last_post_sud=None, version=0):
+        self.session_count = session_count
+        self.avg_sud_reduction = (sum_pre_sud - sum_post_sud) / session_count if session_count else 0
+        self.total_hours = sum_duration / 60
+        self.last_post_sud = last_post_sud
+        self.version = version
+
+
+class PatientCard:
+    """Карточка пациента на панели терапевта"""
+    
+    def __init__(self, patient, summary, recommendations):
+        self.patient_id = patient.user_id
+        self.name = patient.name
+        self.summary = summary
+        self.top_recommendation = recommendations[0] if recommendations else None
+        self.more_recommendations = max(len(recommendations) - 1, 0)
+    
+    @property
+    def fragment_key(self):
+        """Ключ кэша разметки: цифры по сессиям меняются только вместе с версией истории пациента"""
+        rec = self.top_recommendation
+        top = (rec['priority'], rec['title'], rec['description']) if rec else None
+        return (self.patient_id, self.summary.version, self.name, top, self.more_recommendations)
+
+
+class TherapistPanel:
+    """Данные панели терапевта"""
+    
+    def __init__(self, cards, average_sud_reduction):
+        self.cards = cards
+        self.average_sud_reduction = average_sud_reduction
+        self.total_sessions = sum(card.summary.session_count for card in cards)
+        self.avg_sessions_per_patient = self.total_sessions / len(cards) if cards else 0
+
+
+class DashboardViews:
+    def __init__(self, db, user_manager, sud_stats, recommendations):
+        self.db = db
+        self.user_manager = user_manager
+        self.sud_stats = sud_stats
+        self.recommendations = recommendations
+    
+    def get_summaries(self, patient_ids):
+        """{patient_id: PatientSummary}; пациенты без сессий получают нулевые итоги"""
+        patient_ids = list(dict.fromkeys(patient_ids))
+        summaries = {patient_id: PatientSummary() for patient_id in patient_ids}
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(patient_ids), PATIENT_BATCH_SIZE):
+                batch = patient_ids[start:start + PATIENT_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                # Последний SUD - по индексу (patient_id, date), без чтения всей истории
+                cursor.execute(f'''
+                    SELECT st.patient_id, st.session_count, st.sum_pre_sud, st.sum_post_sud, st.sum_duration,
+                           (SELECT s.post_sud FROM therapy_sessions s WHERE s.patient_id = st.patient_id
+                            ORDER BY s.date DESC, s.id DESC LIMIT 1),
+                           COALESCE(v.version, 0)
+                    FROM sud_stats_patient st
+                    LEFT JOIN patient_versions v ON v.patient_id = st.patient_id
+                    WHERE st.patient_id IN ({placeholders}) AND st.session_count > 0
+                ''', batch)
+                for row in cursor:
+                    summaries[row[0]] = PatientSummary(*row[1:])
+        
+        return summaries
+    
+    def get_patient_summary(self, patient_id):
+        return self.get_summaries([patient_id])[patient_id]
+    
+    def get_therapist_panel(self, therapist_id):
+        with self.db.connection():
+            patients = self.user_manager.get_patients_by_therapist(therapist_id)
+            patient_ids = [patient.user_id for patient in patients]
+            summaries = self.get_summaries(patient_ids)
+            recommendations = self.recommendations.get_recommendations(patient_ids)
+            stats = self.sud_stats.get_therapist_stats(therapist_id)
+        
+        cards = [
+            PatientCard(patient, summaries[patient.user_id],
+                        recommendations.get(patient.user_id, {}).get('recommendations', []))
+            for patient in patients
+        ]
+        return TherapistPanel(cards, stats['avg_sud_reduction'])
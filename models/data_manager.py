@@ -1,49 +1,95 @@
-from .database import Database
-from .user_models import UserManager
-from .therapy_models import TherapyDataManager
-from .license_manager import LicenseManager
-from .test_manager import TestManager
-
-class DataManager:
-    def __init__(self, db_path='data/vr_therapy.db'):
-        self.db = Database(db_path)
-        self.user_manager = UserManager(self.db)
-        self.therapy_manager = TherapyDataManager(self.db)
-        self.license_manager = LicenseManager(self.db)
-        self.test_manager = TestManager(self.db)
-    
-    def get_patient_with_sessions(self, patient_id):
-        patient = self.user_manager.get_user_by_id(patient_id)
-        if patient and patient.role == 'patient':
-            sessions = self.therapy_manager.get_sessions_by_patient(patient_id)
-            return patient, sessions
-        return None, []
-    
-    def get_all_patients_with_sessions(self):
-        # Получаем всех пациентов текущего терапевта (пока используем TH001 для демо)
-        patients = self.user_manager.get_patients_by_therapist("TH001")
-        result = []
-        for patient in patients:
-            sessions = self.therapy_manager.get_sessions_by_patient(patient.user_id)
-            result.append((patient, sessions))
-        return result
-    
-    def get_patients_by_therapist_id(self, therapist_id):
-        """Получить пациентов по ID терапевта"""
-        patients = self.user_manager.get_patients_by_therapist(therapist_id)
-        result = []
-        for patient in patients:
-            sessions = self.therapy_manager.get_sessions_by_patient(patient.user_id)
-            result.append((patient, sessions))
-        return result
-    
-    def calculate_average_sud_reduction(self):
-        all_sessions = self.therapy_manager.get_all_sessions()
-        if not all_sessions:
-            return 0
-        
-        total_reduction = 0
-        for session in all_sessions:
-            total_reduction += (session.post_sud - session.pre_sud)
-        
-        return total_reduction / len(all_sessions)
\ No newline at end of file
+import threading
+
+from .analytics import CohortAnalytics
+from .cache import LRUCache
+from .dashboards import DashboardViews
+from .database import Database
+from .user_models import UserManager
+from .therapy_models import TherapyDataManager
+from .license_manager import LicenseManager
+from .live_sessions import LiveSessionStore
+from .passwords import PasswordHasher
+from .recommendations import RecommendationEngine
+from .slow_queries import SlowQueryLog
+from .test_manager import TestManager
+from .sud_stats import SudStatsManager
+from .vitals_store import VitalsStore
+from .write_behind import WriteBehindQueue
+
+DEFAULT_DB_PATH = 'data/vr_therapy.db'
+
+# Общий DataManager процесса (см. bootstrap / get_data_manager)
+_instance = None
+_instance_lock = threading.Lock()
+
+def bootstrap(db_path=DEFAULT_DB_PATH, **options):
+    """Однократная инициализация слоя данных: проверка схемы и создание общего DataManager"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            data_manager = DataManager(db_path, **options)
+            data_manager.db.ensure_schema()
+            _instance = data_manager
+        return _instance
+
+def get_data_manager():
+    """Общий DataManager процесса; при первом обращении выполняет bootstrap с настройками по умолчанию"""
+    return _instance or bootstrap()
+
+class DataManager:
+    def __init__(self, db_path=DEFAULT_DB_PATH, pool_size=8,
+                 user_cache_enabled=True, user_cache_size=1024, user_cache_ttl=300,
+                 license_cache_size=1024, license_cache_ttl=3600,
+                 live_session_ttl=4 * 3600, live_session_persist=False,
+                 write_batch_interval=0.2, password_hash_workers=2, password_hash_queue=32,
+                 sql_instrumentation=False, slow_query_ms=0):
+        # Журнал медленных SQL-выражений; 0 - выключен
+        self.slow_queries = SlowQueryLog(slow_query_ms) if slow_query_ms else None
+        self.db = Database(db_path, pool_size=pool_size, instrument=sql_instrumentation,
+                           slow_query_log=self.slow_queries)
+        user_cache = LRUCache(user_cache_size, user_cache_ttl) if user_cache_enabled else None
+        self.user_manager = UserManager(self.db, cache=user_cache,
+                                        hasher=PasswordHasher(password_hash_workers, password_hash_queue))
+        self.therapy_manager = TherapyDataManager(self.db)
+        self.license_manager = LicenseManager(self.db, cache=LRUCache(license_cache_size, license_cache_ttl))
+        self.test_manager = TestManager(self.db)
+        self.sud_stats = SudStatsManager(self.db)
+        self.analytics = CohortAnalytics(self.db)
+        self.recommendations = RecommendationEngine(self.db)
+        self.dashboards = DashboardViews(self.db, self.user_manager, self.sud_stats, self.recommendations)
+        self.vitals_store = VitalsStore(self.db)
+        self.live_sessions = LiveSessionStore(self.db if live_session_persist else None, live_session_ttl)
+        self.write_queue = WriteBehindQueue(self.db, self.therapy_manager.add_sessions, write_batch_interval)
+    
+    def get_patient_with_sessions(self, patient_id):
+        with self.db.connection():
+            patient = self.user_manager.get_user_by_id(patient_id)
+            if patient and patient.role == 'patient':
+                sessions = self.therapy_manager.get_sessions_by_patient(patient_id)
+                return patient, sessions
+        return None, []
+    
+    def get_all_patients_with_sessions(self):
+        # Получаем всех пациентов текущего терапевта (пока используем TH001 для демо)
+        return self.get_patients_by_therapist_id("TH001")
+    
+    def get_patients_by_therapist_id(self, therapist_id):
+        """Получить пациентов по ID терапевта"""
+        with self.db.connection():
+            patients = self.user_manager.get_patients_by_therapist(therapist_id)
+            return self._attach_sessions(patients)
+    
+    def _attach_sessions(self, patients):
+        """Пары (пациент, сессии) без отдельного запроса на каждого пациента"""
+        sessions_by_patient = self.therapy_manager.get_sessions_for_patients(
+            patient.user_id for patient in patients
+        )
+        return [(patient, sessions_by_patient[patient.user_id]) for patient in patients]
+    
+    def calculate_average_sud_reduction(self, therapist_id=None):
+        """Среднее изменение SUD (post - pre) по пациентам терапевта или по всем сессиям"""
+        if therapist_id:
+            stats = self.sud_stats.get_therapist_stats(therapist_id)
+        else:
+            stats = self.sud_stats.get_overall_stats()
+        return stats['avg_sud_reduction']
\ No newline at end of file
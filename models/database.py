@@ -1,215 +1,329 @@
-import sqlite3
-import os
-from datetime import datetime, timedelta
-import hashlib
-import secrets
-import string
-import json
-
-class Database:
-    def __init__(self, db_path='data/vr_therapy.db'):
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Таблица пользователей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT UNIQUE NOT NULL,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL,
-                name TEXT NOT NULL,
-                therapist_id TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (therapist_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # Таблица лицензий терапевтов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS therapist_licenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                therapist_id TEXT NOT NULL,
-                license_type TEXT DEFAULT 'basic',
-                is_active BOOLEAN DEFAULT 0,
-                test_passed BOOLEAN DEFAULT 0,
-                test_score INTEGER DEFAULT 0,
-                test_date TIMESTAMP,
-                license_expires TIMESTAMP,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (therapist_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # Таблица сессий терапии
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS therapy_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE NOT NULL,
-                patient_id TEXT NOT NULL,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                duration_minutes INTEGER NOT NULL,
-                module_used TEXT NOT NULL,
-                pre_sud INTEGER NOT NULL,
-                post_sud INTEGER NOT NULL,
-                parameters TEXT,
-                FOREIGN KEY (patient_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # Таблица тестовых вопросов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS test_questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question_text TEXT NOT NULL,
-                options TEXT NOT NULL, -- JSON массив вариантов
-                correct_answer INTEGER NOT NULL, -- индекс правильного ответа
-                explanation TEXT,
-                question_type TEXT DEFAULT 'theory'
-            )
-        ''')
-        
-        # Вставляем демо-данные
-        self.insert_sample_data(cursor)
-        conn.commit()
-        conn.close()
-    
-    def insert_sample_data(self, cursor):
-        cursor.execute("SELECT COUNT(*) FROM users")
-        if cursor.fetchone()[0] == 0:
-            from datetime import datetime, timedelta
-            
-            # Добавляем суперадмина
-            superadmin = [
-                ('SA001', 'superadmin', self.hash_password('admin123'), 'superadmin', 'Системный Администратор')
-            ]
-            
-            for admin in superadmin:
-                cursor.execute('''
-                    INSERT INTO users (user_id, username, password_hash, role, name)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', admin)
-            
-            # Добавляем терапевтов
-            therapists = [
-                ('TH001', 'therapist', self.hash_password('therapy123'), 'therapist', 'Др. Смирнова'),
-                ('TH002', 'doctor2', self.hash_password('doctor123'), 'therapist', 'Др. Петров'),
-                ('TH003', 'licensed_doc', self.hash_password('license123'), 'therapist', 'Др. Козлова')
-            ]
-            
-            for therapist in therapists:
-                cursor.execute('''
-                    INSERT INTO users (user_id, username, password_hash, role, name)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', therapist)
-            
-            # Добавляем пациентов
-            patients = [
-                ('PT001', 'pt001234', self.hash_password('pass123'), 'patient', 'Иван Петров', 'TH001'),
-                ('PT002', 'pt002345', self.hash_password('pass123'), 'patient', 'Мария Сидорова', 'TH001'),
-                ('PT003', 'pt003456', self.hash_password('pass123'), 'patient', 'Алексей Иванов', 'TH002'),
-                ('PT004', 'pt004567', self.hash_password('pass123'), 'patient', 'Елена Васильева', 'TH003')
-            ]
-            
-            for patient in patients:
-                cursor.execute('''
-                    INSERT INTO users (user_id, username, password_hash, role, name, therapist_id)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', patient)
-            
-            # Добавляем тестовые вопросы (ИСПРАВЛЕННЫЕ JSON)
-            questions = [
-                {
-                    'question_text': 'Что такое контролируемая экспозиция в VR-терапии ПТСР?',
-                    'options': '["Полное погружение в травмирующую ситуацию", "Постепенное воздействие на пациента в безопасной среде", "Избегание любых напоминаний о травме", "Медикаментозное лечение"]',
-                    'correct_answer': 1,
-                    'explanation': 'Контролируемая экспозиция - это постепенное воздействие на пациента элементами травмирующей ситуации в безопасной контролируемой среде VR.',
-                    'question_type': 'theory'
-                },
-                {
-                    'question_text': 'Что делать при резком повышении SUD (субъективной единицы дистресса) у пациента во время сессии?',
-                    'options': '["Продолжить сессию", "Немедленно перейти к модулю \\"Безопасное место\\"", "Увеличить интенсивность стимулов", "Прервать сессию без последующих действий"]',
-                    'correct_answer': 1,
-                    'explanation': 'При резком повышении SUD необходимо немедленно перевести пациента в безопасное место для стабилизации состояния.',
-                    'question_type': 'emergency'
-                },
-                {
-                    'question_text': 'Какой частотный диапазон используется в EMDR-модуле?',
-                    'options': '["0.1-0.5 Гц", "1-4 Гц", "5-10 Гц", "10-20 Гц"]',
-                    'correct_answer': 1,
-                    'explanation': 'В EMDR-терапии используется частота 1-4 Гц для билатеральной стимуляции.',
-                    'question_type': 'technical'
-                },
-                {
-                    'question_text': 'Что означает кнопка экстренной остановки?',
-                    'options': '["Пауза сессии", "Перезагрузка системы", "Мгновенное прекращение всех стимулов", "Смена сцены"]',
-                    'correct_answer': 2,
-                    'explanation': 'Кнопка экстренной остановки мгновенно прекращает все стимулы и переводит систему в безопасный режим.',
-                    'question_type': 'emergency'
-                },
-                {
-                    'question_text': 'Как часто нужно обновлять лицензию терапевта VR-терапии?',
-                    'options': '["Каждый месяц", "Каждые 6 месяцев", "Каждый год", "Каждые 2 года"]',
-                    'correct_answer': 2,
-                    'explanation': 'Лицензия терапевта VR-терапии требует ежегодного обновления через прохождение тестирования.',
-                    'question_type': 'administrative'
-                }
-            ]
-            
-            for q in questions:
-                cursor.execute('''
-                    INSERT INTO test_questions (question_text, options, correct_answer, explanation, question_type)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (q['question_text'], q['options'], q['correct_answer'], q['explanation'], q['question_type']))
-            
-            # Добавляем лицензии для терапевтов
-            license_expires = datetime.now() + timedelta(days=365)
-            
-            licenses = [
-                ('TH001', 'basic', 0, 0, 0, None, None),
-                ('TH002', 'basic', 0, 0, 0, None, None),
-                ('TH003', 'premium', 1, 1, 95, datetime.now().isoformat(), license_expires.isoformat())
-            ]
-            
-            for license_data in licenses:
-                cursor.execute('''
-                    INSERT INTO therapist_licenses 
-                    (therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', license_data)
-            
-            # Добавляем демо-сессии
-            sessions = [
-                ('SES_PT001_1', 'PT001', '2024-01-10 10:00:00', 30, '360° Экспозиция', 7, 4),
-                ('SES_PT001_2', 'PT001', '2024-01-15 11:00:00', 35, 'EMDR', 6, 3),
-                ('SES_PT001_3', 'PT001', '2024-01-20 09:30:00', 40, 'Безопасное место - Море', 5, 2),
-                ('SES_PT002_1', 'PT002', '2024-01-12 14:00:00', 30, '360° Экспозиция', 8, 5),
-                ('SES_PT002_2', 'PT002', '2024-01-18 15:00:00', 35, 'Безопасное место - Лес', 7, 4),
-                ('SES_PT003_1', 'PT003', '2024-01-14 16:00:00', 30, 'EMDR', 6, 3),
-                ('SES_PT004_1', 'PT004', '2024-01-16 09:00:00', 45, '360° Экспозиция', 6, 2),
-                ('SES_PT004_2', 'PT004', '2024-01-23 10:00:00', 50, 'EMDR', 5, 1),
-                ('SES_PT004_3', 'PT004', '2024-01-30 11:00:00', 40, 'Безопасное место - Горы', 4, 1)
-            ]
-            
-            for session in sessions:
-                cursor.execute('''
-                    INSERT INTO therapy_sessions (session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', session)
-    
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
-    
-    @staticmethod
-    def hash_password(password):
-        return hashlib.sha256(password.encode()).hexdigest()
-    
-    def verify_password(self, password, password_hash):
-        return self.hash_password(password) == password_hash
\ No newline at end of file
+import sqlite3
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import secrets
+import string
+import json
+
+from . import passwords
+from .query_stats import InstrumentedConnection
+
+# Настройки соединений SQLite
+STATEMENT_CACHE_SIZE = 256          # подготовленных выражений на соединение
+CACHE_SIZE_KIB = 16384              # страничный кэш, KiB
+MMAP_SIZE = 256 * 1024 * 1024       # отображение файла БД в память, байт
+
+class Database:
+    def __init__(self, db_path='data/vr_therapy.db', pool_size=8, busy_timeout_ms=5000,
+                 instrument=False, slow_query_log=None):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.busy_timeout_ms = busy_timeout_ms
+        # Учет числа и времени выражений на запрос (models/query_stats.py);
+        # журнал медленных выражений (models/slow_queries.py) требует учета
+        self.slow_query_log = slow_query_log
+        self.instrument = instrument or slow_query_log is not None
+        
+        # Пул долгоживущих соединений и соединение, занятое текущим потоком
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._pool_lock = threading.Lock()
+        self._created_connections = 0
+        self._local = threading.local()
+    
+    def init_database(self):
+        """Применяет недостающие миграции схемы (вызывается при развертывании)"""
+        from .migrations import migrate
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        return migrate(self)
+    
+    def ensure_schema(self):
+        """Применяет миграции, только если схема устарела; для актуальной - одно чтение заголовка"""
+        from .migrations import is_current
+        if os.path.exists(self.db_path) and is_current(self):
+            return []
+        return self.init_database()
+    
+    def create_base_tables(self, cursor):
+        """Исходная схема и демо-данные (миграция 1)"""
+        # Таблица пользователей
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT UNIQUE NOT NULL,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                role TEXT NOT NULL,
+                name TEXT NOT NULL,
+                therapist_id TEXT,
+                is_active BOOLEAN DEFAULT 1,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (therapist_id) REFERENCES users (user_id)
+            )
+        ''')
+        
+        # Таблица лицензий терапевтов
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS therapist_licenses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                therapist_id TEXT NOT NULL,
+                license_type TEXT DEFAULT 'basic',
+                is_active BOOLEAN DEFAULT 0,
+                test_passed BOOLEAN DEFAULT 0,
+                test_score INTEGER DEFAULT 0,
+                test_date TIMESTAMP,
+                license_expires TIMESTAMP,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (therapist_id) REFERENCES users (user_id)
+            )
+        ''')
+        
+        # Таблица сессий терапии
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS therapy_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT UNIQUE NOT NULL,
+                patient_id TEXT NOT NULL,
+                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration_minutes INTEGER NOT NULL,
+                module_used TEXT NOT NULL,
+                pre_sud INTEGER NOT NULL,
+                post_sud INTEGER NOT NULL,
+                parameters TEXT,
+                FOREIGN KEY (patient_id) REFERENCES users (user_id)
+            )
+        ''')
+        
+        # Таблица тестовых вопросов
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS test_questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question_text TEXT NOT NULL,
+                options TEXT NOT NULL, -- JSON массив вариантов
+                correct_answer INTEGER NOT NULL, -- индекс правильного ответа
+                explanation TEXT,
+                question_type TEXT DEFAULT 'theory'
+            )
+        ''')
+        
+        # Вставляем демо-данные
+        self.insert_sample_data(cursor)
+    
+    def insert_sample_data(self, cursor):
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchone()[0] == 0:
+            from datetime import datetime, timedelta
+            
+            # Добавляем суперадмина
+            superadmin = [
+                ('SA001', 'superadmin', self.hash_password('admin123'), 'superadmin', 'Системный Администратор')
+            ]
+            
+            for admin in superadmin:
+                cursor.execute('''
+                    INSERT INTO users (user_id, username, password_hash, role, name)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', admin)
+            
+            # Добавляем терапевтов
+            therapists = [
+                ('TH001', 'therapist', self.hash_password('therapy123'), 'therapist', 'Др. Смирнова'),
+                ('TH002', 'doctor2', self.hash_password('doctor123'), 'therapist', 'Др. Петров'),
+                ('TH003', 'licensed_doc', self.hash_password('license123'), 'therapist', 'Др. Козлова')
+            ]
+            
+            for therapist in therapists:
+                cursor.execute('''
+                    INSERT INTO users (user_id, username, password_hash, role, name)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', therapist)
+            
+            # Добавляем пациентов
+            patients = [
+                ('PT001', 'pt001234', self.hash_password('pass123'), 'patient', 'Иван Петров', 'TH001'),
+                ('PT002', 'pt002345', self.hash_password('pass123'), 'patient', 'Мария Сидорова', 'TH001'),
+                ('PT003', 'pt003456', self.hash_password('pass123'), 'patient', 'Алексей Иванов', 'TH002'),
+                ('PT004', 'pt004567', self.hash_password('pass123'), 'patient', 'Елена Васильева', 'TH003')
+            ]
+            
+            for patient in patients:
+                cursor.execute('''
+                    INSERT INTO users (user_id, username, password_hash, role, name, therapist_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', patient)
+            
+            # Добавляем тестовые вопросы (ИСПРАВЛЕННЫЕ JSON)
+            questions = [
+                {
+                    'question_text': 'Что такое контролируемая экспозиция в VR-терапии ПТСР?',
+                    'options': '["Полное погружение в травмирующую ситуацию", "Постепенное воздействие на пациента в безопасной среде", "Избегание любых напоминаний о травме", "Медикаментозное лечение"]',
+                    'correct_answer': 1,
+                    'explanation': 'Контролируемая экспозиция - это постепенное воздействие на пациента элементами травмирующей ситуации в безопасной контролируемой среде VR.',
+                    'question_type': 'theory'
+                },
+                {
+                    'question_text': 'Что делать при резком повышении SUD (субъективной единицы дистресса) у пациента во время сессии?',
+                    'options': '["Продолжить сессию", "Немедленно перейти к модулю \\"Безопасное место\\"", "Увеличить интенсивность стимулов", "Прервать сессию без последующих действий"]',
+                    'correct_answer': 1,
+                    'explanation': 'При резком повышении SUD необходимо немедленно перевести пациента в безопасное место для стабилизации состояния.',
+                    'question_type': 'emergency'
+                },
+                {
+                    'question_text': 'Какой частотный диапазон используется в EMDR-модуле?',
+                    'options': '["0.1-0.5 Гц", "1-4 Гц", "5-10 Гц", "10-20 Гц"]',
+                    'correct_answer': 1,
+                    'explanation': 'В EMDR-терапии используется частота 1-4 Гц для билатеральной стимуляции.',
+                    'question_type': 'technical'
+                },
+                {
+                    'question_text': 'Что означает кнопка экстренной остановки?',
+                    'options': '["Пауза сессии", "Перезагрузка системы", "Мгновенное прекращение всех стимулов", "Смена сцены"]',
+                    'correct_answer': 2,
+                    'explanation': 'Кнопка экстренной остановки мгновенно прекращает все стимулы и переводит систему в безопасный режим.',
+                    'question_type': 'emergency'
+                },
+                {
+                    'question_text': 'Как часто нужно обновлять лицензию терапевта VR-терапии?',
+                    'options': '["Каждый месяц", "Каждые 6 месяцев", "Каждый год", "Каждые 2 года"]',
+                    'correct_answer': 2,
+                    'explanation': 'Лицензия терапевта VR-терапии требует ежегодного обновления через прохождение тестирования.',
+                    'question_type': 'administrative'
+                }
+            ]
+            
+            for q in questions:
+                cursor.execute('''
+                    INSERT INTO test_questions (question_text, options, correct_answer, explanation, question_type)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (q['question_text'], q['options'], q['correct_answer'], q['explanation'], q['question_type']))
+            
+            # Добавляем лицензии для терапевтов
+            license_expires = datetime.now() + timedelta(days=365)
+            
+            licenses = [
+                ('TH001', 'basic', 0, 0, 0, None, None),
+                ('TH002', 'basic', 0, 0, 0, None, None),
+                ('TH003', 'premium', 1, 1, 95, datetime.now().isoformat(), license_expires.isoformat())
+            ]
+            
+            for license_data in licenses:
+                cursor.execute('''
+                    INSERT INTO therapist_licenses 
+                    (therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', license_data)
+            
+            # Добавляем демо-сессии
+            sessions = [
+                ('SES_PT001_1', 'PT001', '2024-01-10 10:00:00', 30, '360° Экспозиция', 7, 4),
+                ('SES_PT001_2', 'PT001', '2024-01-15 11:00:00', 35, 'EMDR', 6, 3),
+                ('SES_PT001_3', 'PT001', '2024-01-20 09:30:00', 40, 'Безопасное место - Море', 5, 2),
+                ('SES_PT002_1', 'PT002', '2024-01-12 14:00:00', 30, '360° Экспозиция', 8, 5),
+                ('SES_PT002_2', 'PT002', '2024-01-18 15:00:00', 35, 'Безопасное место - Лес', 7, 4),
+                ('SES_PT003_1', 'PT003', '2024-01-14 16:00:00', 30, 'EMDR', 6, 3),
+                ('SES_PT004_1', 'PT004', '2024-01-16 09:00:00', 45, '360° Экспозиция', 6, 2),
+                ('SES_PT004_2', 'PT004', '2024-01-23 10:00:00', 50, 'EMDR', 5, 1),
+                ('SES_PT004_3', 'PT004', '2024-01-30 11:00:00', 40, 'Безопасное место - Горы', 4, 1)
+            ]
+            
+            for session in sessions:
+                cursor.execute('''
+                    INSERT INTO therapy_sessions (session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', session)
+    
+    def get_connection(self):
+        """Открывает новое соединение с настроенными PRAGMA (используется пулом)"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=InstrumentedConnection if self.instrument else sqlite3.Connection
+        )
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        conn.execute(f'PRAGMA busy_timeout = {self.busy_timeout_ms}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        if self.instrument:
+            conn.slow_query_log = self.slow_query_log
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Соединение из пула на время блока с одной транзакцией.
+        
+        Вложенные блоки в том же потоке получают то же соединение, поэтому
+        составная операция выполняется на одном соединении и одной транзакции:
+        фиксация происходит при выходе из внешнего блока, откат - при исключении.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._release(conn)
+    
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            can_create = self._created_connections < self.pool_size
+            if can_create:
+                self._created_connections += 1
+        
+        if can_create:
+            try:
+                return self.get_connection()
+            except Exception:
+                with self._pool_lock:
+                    self._created_connections -= 1
+                raise
+        
+        # Пул исчерпан - ждем освобождения соединения
+        try:
+            return self._pool.get(timeout=self.busy_timeout_ms / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError('Пул соединений исчерпан')
+    
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._pool.put_nowait(conn)
+    
+    def close_all(self):
+        """Закрывает все свободные соединения пула"""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._pool_lock:
+                self._created_connections -= 1
+    
+    @staticmethod
+    def hash_password(password):
+        return passwords.hash_password(password)
+    
+    def verify_password(self, password, password_hash):
+        return passwords.verify_password(password, password_hash)
\ No newline at end of file
@@ -1,80 +1,140 @@
-from datetime import datetime, timedelta
-
-class LicenseManager:
-    def __init__(self, db):
-        self.db = db
-    
-    def get_license(self, therapist_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires, created_date
-            FROM therapist_licenses WHERE therapist_id = ?
-        ''', (therapist_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            from .user_models import TherapistLicense
-            # Конвертируем строки в datetime объекты
-            test_date = datetime.fromisoformat(row[5]) if row[5] else None
-            license_expires = datetime.fromisoformat(row[6]) if row[6] else None
-            created_date = datetime.fromisoformat(row[7]) if row[7] else None
-            
-            return TherapistLicense(
-                therapist_id=row[0],
-                license_type=row[1],
-                is_active=bool(row[2]),
-                test_passed=bool(row[3]),
-                test_score=row[4],
-                test_date=test_date,
-                license_expires=license_expires,
-                created_date=created_date
-            )
-        return None
-    
-    def create_license(self, therapist_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO therapist_licenses 
-            (therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires)
-            VALUES (?, 'basic', 0, 0, 0, NULL, NULL)
-        ''', (therapist_id,))
-        conn.commit()
-        conn.close()
-        return self.get_license(therapist_id)
-    
-    def update_license_after_test(self, therapist_id, test_score, passed):
-        license_expires = datetime.now() + timedelta(days=365)  # Лицензия на 1 год
-        test_date = datetime.now()
-        
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE therapist_licenses 
-            SET test_passed = ?, test_score = ?, test_date = ?, license_expires = ?, is_active = ?
-            WHERE therapist_id = ?
-        ''', (passed, test_score, test_date.isoformat(), license_expires.isoformat(), passed, therapist_id))
-        conn.commit()
-        conn.close()
-        
-        return self.get_license(therapist_id)
-    
-    def is_therapist_licensed(self, therapist_id):
-        license = self.get_license(therapist_id)
-        if not license:
-            license = self.create_license(therapist_id)
-        return license.is_valid()
-    
-    def can_retake_test(self, therapist_id):
-        """Проверяет, можно ли пересдавать тест (если до окончания лицензии меньше недели)"""
-        license = self.get_license(therapist_id)
-        if not license or not license.is_valid():
-            return True
-        
-        if not license.license_expires:
-            return True
-        
-        days_until_expiry = license.days_until_expiry()
-        return days_until_expiry is not None and days_until_expiry <= 7
+from datetime import datetime, timedelta
+
+# Максимум идентификаторов в одном IN (...) при пакетной выборке
+LICENSE_BATCH_SIZE = 500
+# Отметка в кэше для терапевта без записи о лицензии
+_NO_LICENSE = object()
+
+class LicenseManager:
+    def __init__(self, db, cache=None):
+        self.db = db
+        # Кэш лицензий по (версия therapist_licenses, therapist_id); запись живет не дольше
+        # license_expires. Версию меняет триггер на любую запись в таблицу, поэтому изменение
+        # лицензии в одном процессе видно кэшам всех остальных
+        self.cache = cache
+    
+    def _get_version(self, cursor):
+        cursor.execute("SELECT version FROM data_versions WHERE name = 'therapist_licenses'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    def get_license(self, therapist_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            # Версию читаем до строки: иначе старая строка могла бы попасть в кэш под новой версией
+            version = self._get_version(cursor)
+            if self.cache is not None:
+                cached = self.cache.get((version, therapist_id))
+                if cached is not None:
+                    return None if cached is _NO_LICENSE else cached
+            
+            cursor.execute('''
+                SELECT therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires, created_date
+                FROM therapist_licenses WHERE therapist_id = ?
+            ''', (therapist_id,))
+            row = cursor.fetchone()
+        
+        license = self._license_from_row(row) if row else None
+        self._cache_license(version, therapist_id, license)
+        return license
+    
+    def get_licenses(self, therapist_ids):
+        """Лицензии нескольких терапевтов: {therapist_id: TherapistLicense или None}"""
+        therapist_ids = list(dict.fromkeys(therapist_ids))
+        licenses = {}
+        missing = []
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            version = self._get_version(cursor)
+            for therapist_id in therapist_ids:
+                cached = self.cache.get((version, therapist_id)) if self.cache is not None else None
+                if cached is None:
+                    missing.append(therapist_id)
+                else:
+                    licenses[therapist_id] = None if cached is _NO_LICENSE else cached
+            
+            for start in range(0, len(missing), LICENSE_BATCH_SIZE):
+                batch = missing[start:start + LICENSE_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                cursor.execute(f'''
+                    SELECT therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires, created_date
+                    FROM therapist_licenses WHERE therapist_id IN ({placeholders})
+                ''', batch)
+                for row in cursor.fetchall():
+                    licenses[row[0]] = self._license_from_row(row)
+        
+        for therapist_id in missing:
+            licenses.setdefault(therapist_id, None)
+            self._cache_license(version, therapist_id, licenses[therapist_id])
+        
+        return licenses
+    
+    def _license_from_row(self, row):
+        from .user_models import TherapistLicense
+        # Конвертируем строки в datetime объекты
+        test_date = datetime.fromisoformat(row[5]) if row[5] else None
+        license_expires = datetime.fromisoformat(row[6]) if row[6] else None
+        created_date = datetime.fromisoformat(row[7]) if row[7] else None
+        
+        return TherapistLicense(
+            therapist_id=row[0],
+            license_type=row[1],
+            is_active=bool(row[2]),
+            test_passed=bool(row[3]),
+            test_score=row[4],
+            test_date=test_date,
+            license_expires=license_expires,
+            created_date=created_date
+        )
+    
+    def _cache_license(self, version, therapist_id, license):
+        if self.cache is None:
+            return
+        expires_at = None
+        if license and license.license_expires:
+            # Запись истекает ровно в момент окончания лицензии
+            seconds_left = (license.license_expires - datetime.now()).total_seconds()
+            expires_at = self.cache.clock() + max(seconds_left, 0)
+        self.cache.set((version, therapist_id), license or _NO_LICENSE, expires_at=expires_at)
+    
+    def create_license(self, therapist_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO therapist_licenses 
+                (therapist_id, license_type, is_active, test_passed, test_score, test_date, license_expires)
+                VALUES (?, 'basic', 0, 0, 0, NULL, NULL)
+            ''', (therapist_id,))
+        return self.get_license(therapist_id)
+    
+    def update_license_after_test(self, therapist_id, test_score, passed):
+        license_expires = datetime.now() + timedelta(days=365)  # Лицензия на 1 год
+        test_date = datetime.now()
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE therapist_licenses 
+                SET test_passed = ?, test_score = ?, test_date = ?, license_expires = ?, is_active = ?
+                WHERE therapist_id = ?
+            ''', (passed, test_score, test_date.isoformat(), license_expires.isoformat(), passed, therapist_id))
+        
+        return self.get_license(therapist_id)
+    
+    def is_therapist_licensed(self, therapist_id):
+        license = self.get_license(therapist_id)
+        if not license:
+            license = self.create_license(therapist_id)
+        return license.is_valid()
+    
+    def can_retake_test(self, therapist_id):
+        """Проверяет, можно ли пересдавать тест (если до окончания лицензии меньше недели)"""
+        license = self.get_license(therapist_id)
+        if not license or not license.is_valid():
+            return True
+        
+        if not license.license_expires:
+            return True
+        
+        days_until_expiry = license.days_until_expiry()
+        return days_until_expiry is not None and days_until_expiry <= 7
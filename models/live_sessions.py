@@ -0,0 +1,98 @@
+import json
+import secrets
+import threading
+import time
+
+class LiveSessionStore:
+    """Серверное хранилище активных VR-сессий и симуляций.
+    
+    В cookie остается только идентификатор записи. Изменения выполняются атомарно
+    через update(); заброшенные записи удаляются expire() по времени последнего
+    изменения. Без db записи живут в памяти процесса; с db хранятся в таблице
+    live_sessions, общей для всех процессов приложения и переживающей перезапуск.
+    """
+    
+    def __init__(self, db=None, ttl=4 * 3600):
+        self.db = db
+        self.ttl = ttl
+        self._entries = {}  # live_id -> (updated_at, data), только без db
+        self._lock = threading.Lock()
+    
+    def create(self, data, live_id=None):
+        live_id = live_id or secrets.token_urlsafe(16)
+        with self._lock:
+            self._save(live_id, dict(data))
+        return live_id
+    
+    def get(self, live_id):
+        with self._lock:
+            data = self._load(live_id)
+        return dict(data) if data is not None else None
+    
+    def update(self, live_id, changes):
+        """Атомарно применяет changes (dict или функция data -> dict). Возвращает новое состояние или None"""
+        with self._lock:
+            if self.db is None:
+                return self._update(live_id, changes)
+            with self.db.connection() as conn:
+                # Блокировка записи на время чтения-изменения-записи для других процессов
+                conn.execute('BEGIN IMMEDIATE')
+                return self._update(live_id, changes)
+    
+    def delete(self, live_id):
+        """Удаляет запись и возвращает ее последнее состояние"""
+        with self._lock:
+            data = self._load(live_id)
+            if self.db is None:
+                self._entries.pop(live_id, None)
+            else:
+                with self.db.connection() as conn:
+                    conn.execute('DELETE FROM live_sessions WHERE live_id = ?', (live_id,))
+        return data
+    
+    def expire(self):
+        """Удаляет записи без изменений дольше ttl. Возвращает их последние состояния"""
+        deadline = time.time() - self.ttl
+        with self._lock:
+            if self.db is None:
+                expired = [live_id for live_id, (updated_at, _) in self._entries.items()
+                           if updated_at < deadline]
+                return [self._entries.pop(live_id)[1] for live_id in expired]
+            
+            with self.db.connection() as conn:
+                rows = conn.execute('SELECT data FROM live_sessions WHERE updated_at < ?',
+                                    (deadline,)).fetchall()
+                conn.execute('DELETE FROM live_sessions WHERE updated_at < ?', (deadline,))
+            return [json.loads(row[0]) for row in rows]
+    
+    def _update(self, live_id, changes):
+        data = self._load(live_id)
+        if data is None:
+            return None
+        data = changes(dict(data)) if callable(changes) else {**data, **changes}
+        self._save(live_id, data)
+        return dict(data)
+    
+    def _load(self, live_id):
+        if self.db is None:
+            entry = self._entries.get(live_id)
+        else:
+            with self.db.connection() as conn:
+                row = conn.execute('SELECT updated_at, data FROM live_sessions WHERE live_id = ?',
+                                   (live_id,)).fetchone()
+            entry = (row[0], json.loads(row[1])) if row else None
+        
+        if entry is None or entry[0] < time.time() - self.ttl:
+            return None
+        return entry[1]
+    
+    def _save(self, live_id, data):
+        updated_at = time.time()
+        if self.db is None:
+            self._entries[live_id] = (updated_at, data)
+            return
+        with self.db.connection() as conn:
+            conn.execute('''
+                INSERT INTO live_sessions (live_id, data, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (live_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+            ''', (live_id, json.dumps(data), updated_at))
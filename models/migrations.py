@@ -0,0 +1,343 @@
+"""Версионированные миграции схемы БД.
+
+Каждая миграция применяется один раз и фиксируется в таблице schema_version.
+Запуск при развертывании:
+
+    python -m models.migrations [путь_к_бд]
+"""
+import sys
+
+
+def _base_schema(db, cursor):
+    db.create_base_tables(cursor)
+
+
+def _lookup_indexes(db, cursor):
+    # Сессии пациента в хронологическом порядке
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_therapy_sessions_patient_date
+        ON therapy_sessions (patient_id, date)
+    ''')
+    # Пациенты терапевта с фильтром по роли и активности
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_therapist_role_active
+        ON users (therapist_id, role, is_active)
+    ''')
+
+
+def _unique_therapist_license(db, cursor):
+    # Оставляем последнюю запись из дублей, накопленных INSERT OR REPLACE
+    cursor.execute('''
+        DELETE FROM therapist_licenses
+        WHERE id NOT IN (SELECT MAX(id) FROM therapist_licenses GROUP BY therapist_id)
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_therapist_licenses_therapist
+        ON therapist_licenses (therapist_id)
+    ''')
+
+
+def _sud_rollups(db, cursor):
+    from .sud_stats import ROLLUP_COLUMNS, create_rollup_triggers, rebuild_rollups
+    
+    for table, key in (('sud_stats_patient', 'patient_id'),
+                       ('sud_stats_therapist', 'therapist_id'),
+                       ('sud_stats_module', 'module_used')):
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} TEXT PRIMARY KEY,
+                {', '.join(f'{column} INTEGER NOT NULL DEFAULT 0' for column in ROLLUP_COLUMNS)}
+            )
+        ''')
+    create_rollup_triggers(cursor)
+    rebuild_rollups(cursor)
+
+
+def _data_versions(db, cursor):
+    # Счетчики изменений наборов данных для инвалидации кэшей
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('test_questions', 1)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_test_questions_version_{event.lower()}
+            AFTER {event} ON test_questions
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'test_questions';
+            END
+        ''')
+
+
+def _vital_chunks(db, cursor):
+    # Пачки показаний сессии, см. models/vitals_store.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vital_chunks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            patient_id TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL,
+            timestamps BLOB NOT NULL,
+            vital_values BLOB NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vital_chunks_session_start
+        ON vital_chunks (session_id, start_ts)
+    ''')
+
+
+def _live_sessions(db, cursor):
+    # Активные сессии и симуляции, см. models/live_sessions.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS live_sessions (
+            live_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_live_sessions_updated ON live_sessions (updated_at)
+    ''')
+
+
+def _sud_events(db, cursor):
+    # Журнал оценок SUD за сессию, пишется фоном, см. models/write_behind.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sud_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            patient_id TEXT,
+            phase TEXT NOT NULL,
+            sud_value INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            recorded_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sud_events_session ON sud_events (session_id, recorded_at)
+    ''')
+
+
+def _pagination_indexes(db, cursor):
+    # Список пользователей по user_id с фильтром по роли и активности.
+    # История пациента по (date, id) уже покрыта idx_therapy_sessions_patient_date (id = rowid)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_role_active ON users (role, is_active, user_id)
+    ''')
+
+
+def _id_sequences(db, cursor):
+    # Счетчики идентификаторов пользователей (PT001, TH001, ...), см. UserManager.allocate_ids
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            prefix TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )
+    ''')
+    # Продолжаем с максимального существующего номера, а не с количества строк
+    for prefix in ('PT', 'TH'):
+        cursor.execute('SELECT user_id FROM users WHERE user_id LIKE ?', (prefix + '%',))
+        numbers = [int(user_id[len(prefix):]) for (user_id,) in cursor.fetchall()
+                   if user_id[len(prefix):].isdigit()]
+        cursor.execute('INSERT OR IGNORE INTO id_sequences (prefix, next_value) VALUES (?, ?)',
+                       (prefix, max(numbers, default=0) + 1))
+
+
+def _session_versions(db, cursor):
+    # Правки истории сессий и привязки пациентов к терапевтам, см. models/analytics.py.
+    # Новые сессии отслеживаются по id, поэтому INSERT счетчик не меняет
+    cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('therapy_sessions_edits', 1)")
+    cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('patient_assignments', 1)")
+    for event in ('UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_therapy_sessions_edits_{event.lower()}
+            AFTER {event} ON therapy_sessions
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'therapy_sessions_edits';
+            END
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_patient_assignments_version
+        AFTER UPDATE OF therapist_id ON users
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = 'patient_assignments';
+        END
+    ''')
+
+
+def _patient_preferences(db, cursor):
+    from .patient_preferences import create_preference_triggers, rebuild_preferences
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS patient_preferences (
+            patient_id TEXT PRIMARY KEY,
+            module_counts TEXT NOT NULL DEFAULT '{}',
+            session_count INTEGER NOT NULL DEFAULT 0,
+            sum_sud_reduction INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    create_preference_triggers(cursor)
+    rebuild_preferences(cursor)
+
+
+def _patient_versions(db, cursor):
+    # Версия истории сессий каждого пациента: меняется при любой записи в его сессии
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS patient_versions (
+            patient_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL  -- unix-время последнего изменения
+        )
+    ''')
+    bump = '''
+        INSERT INTO patient_versions (patient_id, version, updated_at)
+        VALUES ({row}.patient_id, 1, CAST(strftime('%s', 'now') AS INTEGER))
+        ON CONFLICT (patient_id) DO UPDATE SET
+            version = version + 1, updated_at = excluded.updated_at;
+    '''
+    for event, rows in (('INSERT', ('NEW',)), ('DELETE', ('OLD',)), ('UPDATE', ('OLD', 'NEW'))):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_patient_versions_{event.lower()}
+            AFTER {event} ON therapy_sessions
+            BEGIN {''.join(bump.format(row=row) for row in rows)} END
+        ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO patient_versions (patient_id, version, updated_at)
+        SELECT patient_id, 1, CAST(strftime('%s', 'now') AS INTEGER) FROM therapy_sessions GROUP BY patient_id
+    ''')
+    
+    # Кэш рекомендаций, см. models/recommendations.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS patient_recommendations (
+            patient_id TEXT PRIMARY KEY,
+            recommendations TEXT NOT NULL,
+            last_session TEXT,
+            mean_interval_days REAL,
+            computed_at TEXT NOT NULL,
+            source_version INTEGER NOT NULL
+        )
+    ''')
+
+
+def _sud_reassignment(db, cursor):
+    from .sud_stats import create_reassignment_trigger, rebuild_rollups
+    
+    create_reassignment_trigger(cursor)
+    # Сводки терапевтов могли разойтись после прежних переназначений
+    rebuild_rollups(cursor)
+
+
+def _license_versions(db, cursor):
+    # Версия лицензий для кэша LicenseManager, общая для всех процессов
+    cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('therapist_licenses', 1)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_therapist_licenses_version_{event.lower()}
+            AFTER {event} ON therapist_licenses
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'therapist_licenses';
+            END
+        ''')
+
+
+def _user_versions(db, cursor):
+    # Версия пользователей для кэша UserManager, общая для всех процессов
+    cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('users', 1)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_users_version_{event.lower()}
+            AFTER {event} ON users
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'users';
+            END
+        ''')
+
+
+# (версия, описание, функция) - строго по возрастанию версии
+MIGRATIONS = [
+    (1, 'Базовые таблицы и демо-данные', _base_schema),
+    (2, 'Индексы сессий и пациентов терапевта', _lookup_indexes),
+    (3, 'Одна лицензия на терапевта', _unique_therapist_license),
+    (4, 'Накопительная статистика SUD', _sud_rollups),
+    (5, 'Версии данных для инвалидации кэшей', _data_versions),
+    (6, 'Временные ряды показателей сессий', _vital_chunks),
+    (7, 'Серверное хранилище активных сессий', _live_sessions),
+    (8, 'Журнал оценок SUD', _sud_events),
+    (9, 'Индекс списка пользователей', _pagination_indexes),
+    (10, 'Счетчики идентификаторов пользователей', _id_sequences),
+    (11, 'Версии истории сессий', _session_versions),
+    (12, 'Материализованные предпочтения пациентов', _patient_preferences),
+    (13, 'Версии истории пациентов и кэш рекомендаций', _patient_versions),
+    (14, 'Статистика SUD при смене терапевта', _sud_reassignment),
+    (15, 'Версия лицензий для инвалидации кэша', _license_versions),
+    (16, 'Версия пользователей для инвалидации кэша', _user_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _read_version(conn):
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def is_current(db):
+    """Быстрая проверка по заголовку файла БД (PRAGMA user_version), без обращения к таблицам"""
+    with db.connection() as conn:
+        return conn.execute('PRAGMA user_version').fetchone()[0] >= LATEST_VERSION
+
+
+def current_version(db):
+    """Версия схемы, примененная к БД (0 - миграции не применялись)"""
+    with db.connection() as conn:
+        _ensure_version_table(conn)
+        return _read_version(conn)
+
+
+def migrate(db):
+    """Применяет недостающие миграции, каждую в своей транзакции. Возвращает список версий"""
+    applied = []
+    with db.connection() as conn:
+        _ensure_version_table(conn)
+        conn.execute(f'PRAGMA user_version = {_read_version(conn)}')
+        for version, description, apply in MIGRATIONS:
+            # IMMEDIATE блокирует запись, чтобы параллельные процессы не применили миграцию дважды
+            conn.execute('BEGIN IMMEDIATE')
+            if version <= _read_version(conn):
+                conn.rollback()
+                continue
+            
+            cursor = conn.cursor()
+            apply(db, cursor)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                           (version, description))
+            # Копия версии в заголовке файла для быстрой проверки is_current
+            cursor.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+            applied.append(version)
+    return applied
+
+
+if __name__ == '__main__':
+    from .database import Database
+    
+    database = Database(*sys.argv[1:2])
+    applied = database.init_database()
+    if applied:
+        print(f"Применены миграции: {', '.join(map(str, applied))}")
+    print(f"Версия схемы: {current_version(database)}")
@@ -0,0 +1,27 @@
+import base64
+import json
+
+# Курсор - непрозрачная строка с ключом сортировки последней строки страницы.
+# Следующая страница читается условием "ключ > курсор" по индексу, без OFFSET.
+
+def encode_cursor(*key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size):
+    """Ключ сортировки из курсора; ValueError, если курсор поврежден"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError('Некорректный курсор')
+    return key
+
+def page_size(value, default, maximum):
+    """Размер страницы из параметра запроса, ограниченный [1, maximum]"""
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
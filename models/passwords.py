@@ -0,0 +1,96 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Параметры scrypt для новых хэшей; старые хэши с другими параметрами пересчитываются при входе
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+class HasherBusy(Exception):
+    """Очередь хэширования заполнена - запрос нужно отклонить, а не ждать"""
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+def _scrypt(password, salt, n, r, p):
+    # Ограничение памяти с запасом: scrypt использует 128 * n * r байт
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=KEY_BYTES)
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Хэш с собственной солью: scrypt$n$r$p$соль$ключ"""
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f'scrypt${n}${r}${p}${_b64(salt)}${_b64(key)}'
+
+def verify_password(password, password_hash):
+    if password_hash.startswith('scrypt$'):
+        try:
+            _, n, r, p, salt, key = password_hash.split('$')
+            expected = base64.b64decode(key)
+            actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        except ValueError:
+            return False
+        return hmac.compare_digest(actual, expected)
+    # Старый формат: несоленый SHA-256
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(legacy, password_hash)
+
+def needs_rehash(password_hash, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    return not password_hash.startswith(f'scrypt${n}${r}${p}$')
+
+class PasswordHasher:
+    """Хэширование и проверка паролей в ограниченном пуле потоков.
+    
+    hashlib.scrypt отпускает GIL, поэтому пул из workers потоков загружает до workers ядер,
+    а остальные маршруты продолжают обслуживаться. Одновременно принимается не более
+    workers + max_queue операций; сверх этого submit сразу выбрасывает HasherBusy.
+    """
+    
+    def __init__(self, workers=2, max_queue=32, timeout=10.0, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+        self.workers = workers
+        self.timeout = timeout
+        self.params = (n, r, p)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        self._admission = threading.BoundedSemaphore(workers + max_queue)
+    
+    def hash(self, password):
+        return self._run(hash_password, password, *self.params)
+    
+    def hash_many(self, passwords):
+        """Хэши для массовых операций: пачками по workers, ожидая места в очереди вместо отказа"""
+        hashes = []
+        for start in range(0, len(passwords), self.workers):
+            futures = [self._submit(hash_password, password, *self.params, block=True)
+                       for password in passwords[start:start + self.workers]]
+            hashes.extend(future.result() for future in futures)
+        return hashes
+    
+    def verify(self, password, password_hash):
+        return self._run(verify_password, password, password_hash)
+    
+    def needs_rehash(self, password_hash):
+        return needs_rehash(password_hash, *self.params)
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+    
+    def _run(self, fn, *args):
+        return self._submit(fn, *args).result(self.timeout)
+    
+    def _submit(self, fn, *args, block=False):
+        if not self._admission.acquire(blocking=block):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._admission.release()
+            raise
+        future.add_done_callback(lambda _: self._admission.release())
+        return future
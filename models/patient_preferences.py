@@ -0,0 +1,78 @@
+"""Материализованные предпочтения пациентов: одна строка на пациента.
+
+Счетчики модулей (JSON-объект в порядке первого использования), число сессий и
+сумма изменений SUD поддерживаются триггерами на therapy_sessions.
+Пересчет с нуля для существующих данных:
+
+    python -m models.patient_preferences rebuild [путь_к_бд]
+"""
+import sys
+
+# Значение счетчика модуля в JSON строки предпочтений (без JSON-путей: имя модуля - произвольная строка)
+_MODULE_COUNT = '(SELECT value FROM json_each(module_counts) WHERE key = {row}.module_used)'
+
+_ADD_SESSION = f'''
+    INSERT INTO patient_preferences (patient_id, module_counts, session_count, sum_sud_reduction)
+    VALUES (NEW.patient_id, json_object(NEW.module_used, 1), 1, NEW.post_sud - NEW.pre_sud)
+    ON CONFLICT (patient_id) DO UPDATE SET
+        module_counts = json_patch(module_counts, json_object(
+            NEW.module_used, coalesce({_MODULE_COUNT.format(row='NEW')}, 0) + 1)),
+        session_count = session_count + 1,
+        sum_sud_reduction = sum_sud_reduction + NEW.post_sud - NEW.pre_sud;
+'''
+
+# json_patch с null удаляет ключ модуля, у которого не осталось сессий
+_REMOVE_SESSION = f'''
+    UPDATE patient_preferences SET
+        module_counts = json_patch(module_counts, json_object(
+            OLD.module_used, nullif({_MODULE_COUNT.format(row='OLD')} - 1, 0))),
+        session_count = session_count - 1,
+        sum_sud_reduction = sum_sud_reduction - (OLD.post_sud - OLD.pre_sud)
+    WHERE patient_id = OLD.patient_id;
+'''
+
+
+def create_preference_triggers(cursor):
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patient_preferences_insert AFTER INSERT ON therapy_sessions
+        BEGIN {_ADD_SESSION} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patient_preferences_delete AFTER DELETE ON therapy_sessions
+        BEGIN {_REMOVE_SESSION} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_patient_preferences_update
+        AFTER UPDATE OF patient_id, module_used, pre_sud, post_sud ON therapy_sessions
+        BEGIN {_REMOVE_SESSION} {_ADD_SESSION} END
+    ''')
+
+
+def rebuild_preferences(cursor):
+    """Пересчитывает предпочтения всех пациентов по текущим сессиям"""
+    cursor.execute('DELETE FROM patient_preferences')
+    cursor.execute('''
+        INSERT INTO patient_preferences (patient_id, module_counts, session_count, sum_sud_reduction)
+        SELECT patient_id, json_group_object(module_used, module_sessions), SUM(module_sessions), SUM(reduction)
+        FROM (
+            SELECT patient_id, module_used, COUNT(*) AS module_sessions,
+                   SUM(post_sud - pre_sud) AS reduction, MIN(date) AS first_used
+            FROM therapy_sessions
+            GROUP BY patient_id, module_used
+            ORDER BY patient_id, first_used
+        )
+        GROUP BY patient_id
+    ''')
+
+
+if __name__ == '__main__':
+    from .database import Database
+    
+    if sys.argv[1:2] != ['rebuild']:
+        print('Использование: python -m models.patient_preferences rebuild [путь_к_бд]')
+        sys.exit(2)
+    db = Database(*sys.argv[2:3])
+    with db.connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        rebuild_preferences(conn.cursor())
+    print('Предпочтения пациентов пересчитаны')
@@ -0,0 +1,136 @@
+"""Учет SQL-выражений: число, суммарное время и самое медленное выражение за запрос.
+
+Database(instrument=True) открывает соединения InstrumentedConnection. Время каждого
+execute/executemany и последующих fetch* того же курсора попадает в QueryStats,
+установленный в текущем контексте через start(). Вне start() учет не ведется.
+Строки, прочитанные итерацией по курсору (for row in cursor), в время не входят.
+
+Если у соединения задан slow_query_log (models/slow_queries.py), выражение, чье время
+превысило порог, записывается в журнал один раз вместе с маршрутом из QueryStats.
+"""
+import contextvars
+import sqlite3
+import threading
+from time import perf_counter
+
+_current = contextvars.ContextVar('query_stats', default=None)
+
+class QueryStats:
+    def __init__(self, route=None):
+        self.route = route
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+
+def start(route=None):
+    """Новый счетчик для текущего контекста; route - маршрут для журнала медленных выражений"""
+    stats = QueryStats(route)
+    _current.set(stats)
+    return stats
+
+def stop():
+    _current.set(None)
+
+def current():
+    return _current.get()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    _sql = None
+    _parameters = None
+    _elapsed = 0.0
+    _logged = False
+    
+    def execute(self, sql, parameters=()):
+        started = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._statement(sql, parameters, perf_counter() - started)
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._statement(sql, None, perf_counter() - started)
+    
+    def executescript(self, sql_script):
+        started = perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._statement(sql_script, None, perf_counter() - started)
+    
+    def fetchone(self):
+        started = perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._fetched(perf_counter() - started)
+    
+    def fetchmany(self, size=None):
+        started = perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            self._fetched(perf_counter() - started)
+    
+    def fetchall(self):
+        started = perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._fetched(perf_counter() - started)
+    
+    def _statement(self, sql, parameters, elapsed):
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = elapsed
+        self._logged = False
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            self._account(stats, elapsed)
+        self._check_slow(stats)
+    
+    def _fetched(self, elapsed):
+        if self._sql is None:
+            return
+        self._elapsed += elapsed
+        stats = _current.get()
+        if stats is not None:
+            self._account(stats, elapsed)
+        self._check_slow(stats)
+    
+    def _check_slow(self, stats):
+        log = self.connection.slow_query_log
+        if log is not None and not self._logged and self._elapsed >= log.threshold:
+            self._logged = True
+            route = stats.route if stats is not None else threading.current_thread().name
+            log.record(self.connection, self._sql, self._parameters, self._elapsed, route)
+    
+    def _account(self, stats, elapsed):
+        stats.total_time += elapsed
+        if self._elapsed > stats.slowest_time:
+            stats.slowest_time = self._elapsed
+            stats.slowest_sql = self._sql
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, все курсоры которого учитываются (в том числе conn.execute)"""
+    
+    slow_query_log = None
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
@@ -0,0 +1,237 @@
+"""Пакетный расчет рекомендаций по пациентам.
+
+Правила считаются векторно сразу для всей выборки пациентов: эффективность модулей,
+тренд post_sud по последним сессиям и частота визитов. Результат хранится в
+patient_recommendations вместе с версией истории пациента (patient_versions), поэтому
+пересчитываются только пациенты, чьи сессии изменились. Пакетный прогон по всем:
+
+    python -m models.recommendations [путь_к_бд]
+"""
+import json
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from .therapy_models import PATIENT_BATCH_SIZE
+
+TREND_WINDOW = 5              # последних сессий для тренда post_sud
+TREND_THRESHOLD = 0.3         # изменение post_sud за сессию, которое считаем трендом
+MIN_MODULE_SESSIONS = 2       # сессий в модуле для оценки его эффективности
+OVERDUE_MIN_DAYS = 14         # перерыв, после которого напоминаем о сессии
+PRIORITY_ORDER = {'high': 0, 'medium': 1, 'low': 2}
+
+class RecommendationEngine:
+    def __init__(self, db):
+        self.db = db
+    
+    def get_recommendations(self, patient_ids):
+        """Рекомендации из кэша; устаревшие для этих пациентов сначала пересчитываются одной пачкой.
+        
+        Возвращает {patient_id: {'recommendations': [...], 'computed_at': ...}}
+        """
+        patient_ids = list(dict.fromkeys(patient_ids))
+        self.refresh(self._stale_patients(patient_ids))
+        
+        results = {}
+        now = datetime.now()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(patient_ids), PATIENT_BATCH_SIZE):
+                batch = patient_ids[start:start + PATIENT_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                cursor.execute(f'''
+                    SELECT patient_id, recommendations, last_session, mean_interval_days, computed_at
+                    FROM patient_recommendations WHERE patient_id IN ({placeholders})
+                ''', batch)
+                for patient_id, recommendations, last_session, mean_interval, computed_at in cursor:
+                    recommendations = json.loads(recommendations)
+                    # Перерыв растет и без новых сессий, поэтому это правило проверяется при чтении
+                    overdue = _overdue_recommendation(last_session, mean_interval, now)
+                    if overdue:
+                        recommendations.append(overdue)
+                    recommendations.sort(key=lambda rec: PRIORITY_ORDER[rec['priority']])
+                    results[patient_id] = {'recommendations': recommendations, 'computed_at': computed_at}
+        return results
+    
+    def refresh(self, patient_ids=None):
+        """Пересчитывает устаревшие рекомендации (всех пациентов, если patient_ids не задан). Возвращает число пациентов"""
+        if patient_ids is None:
+            patient_ids = self._stale_patients()
+        for start in range(0, len(patient_ids), PATIENT_BATCH_SIZE):
+            self._compute(patient_ids[start:start + PATIENT_BATCH_SIZE])
+        return len(patient_ids)
+    
+    def _stale_patients(self, patient_ids=None):
+        query = '''
+            SELECT v.patient_id FROM patient_versions v
+            LEFT JOIN patient_recommendations r ON r.patient_id = v.patient_id
+            WHERE (r.source_version IS NULL OR r.source_version != v.version)
+        '''
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            if patient_ids is None:
+                cursor.execute(query)
+                return [row[0] for row in cursor.fetchall()]
+            
+            stale = []
+            for start in range(0, len(patient_ids), PATIENT_BATCH_SIZE):
+                batch = patient_ids[start:start + PATIENT_BATCH_SIZE]
+                cursor.execute(f"{query} AND v.patient_id IN ({', '.join('?' * len(batch))})", batch)
+                stale.extend(row[0] for row in cursor.fetchall())
+            return stale
+    
+    def _compute(self, patient_ids):
+        if not patient_ids:
+            return
+        placeholders = ', '.join('?' * len(patient_ids))
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            # Транзакцией здесь не управляем - блок может быть вложен в транзакцию вызывающего.
+            # Версии читаются до сессий: сессия, добавленная между запросами, попадет в расчет
+            # с прежней версией, и результат просто будет пересчитан при следующем обращении
+            cursor.execute(f'''
+                SELECT patient_id, version FROM patient_versions WHERE patient_id IN ({placeholders})
+            ''', patient_ids)
+            versions = dict(cursor.fetchall())
+            cursor.execute(f'''
+                SELECT patient_id, module_used, julianday(date), pre_sud, post_sud
+                FROM therapy_sessions WHERE patient_id IN ({placeholders})
+                ORDER BY patient_id, date, id
+            ''', patient_ids)
+            rows = cursor.fetchall()
+        
+        computed = _evaluate(rows)
+        computed_at = datetime.now().isoformat(timespec='seconds')
+        records = []
+        for patient_id in patient_ids:
+            recommendations, last_session, mean_interval = computed.get(patient_id, ([], None, None))
+            records.append((patient_id, json.dumps(recommendations, ensure_ascii=False), last_session,
+                            mean_interval, computed_at, versions.get(patient_id, 0)))
+        
+        with self.db.connection() as conn:
+            conn.executemany('''
+                INSERT INTO patient_recommendations
+                    (patient_id, recommendations, last_session, mean_interval_days, computed_at, source_version)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (patient_id) DO UPDATE SET
+                    recommendations = excluded.recommendations,
+                    last_session = excluded.last_session,
+                    mean_interval_days = excluded.mean_interval_days,
+                    computed_at = excluded.computed_at,
+                    source_version = excluded.source_version
+                WHERE excluded.source_version >= patient_recommendations.source_version
+            ''', records)
+
+def _evaluate(rows):
+    """Правила по сессиям, отсортированным по (пациент, дата): {patient_id: (рекомендации, последняя сессия, интервал)}"""
+    if not rows:
+        return {}
+    patient_ids, modules, days, pre_sud, post_sud = zip(*rows)
+    patients, p = np.unique(np.array(patient_ids, dtype=object), return_inverse=True)
+    module_names, m = np.unique(np.array(modules, dtype=object), return_inverse=True)
+    day = np.array(days, dtype=np.float64)
+    post = np.array(post_sud, dtype=np.float64)
+    reduction = post - np.array(pre_sud, dtype=np.float64)
+    
+    n_patients, n_modules = len(patients), len(module_names)
+    counts = np.bincount(p, minlength=n_patients)
+    ends = np.cumsum(counts)
+    
+    # Эффективность модулей: среднее изменение SUD в паре (пациент, модуль)
+    pair = p * n_modules + m
+    pair_counts = np.bincount(pair, minlength=n_patients * n_modules).reshape(n_patients, n_modules)
+    pair_sums = np.bincount(pair, weights=reduction, minlength=n_patients * n_modules).reshape(n_patients, n_modules)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        module_avg = np.where(pair_counts >= MIN_MODULE_SESSIONS, pair_sums / pair_counts, np.nan)
+    
+    # Тренд post_sud: наклон МНК по последним TREND_WINDOW сессиям пациента
+    from_end = ends[p] - 1 - np.arange(len(p))
+    window = from_end < TREND_WINDOW
+    wp, x, y = p[window], -from_end[window].astype(np.float64), post[window]
+    k = np.bincount(wp, minlength=n_patients)
+    sx, sy = np.bincount(wp, x, n_patients), np.bincount(wp, y, n_patients)
+    sxx, sxy = np.bincount(wp, x * x, n_patients), np.bincount(wp, x * y, n_patients)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where(k >= 3, (k * sxy - sx * sy) / (k * sxx - sx * sx), np.nan)
+    
+    # Частота: средний интервал между первой и последней сессией
+    first_day, last_day = day[ends - counts], day[ends - 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_interval = np.where(counts >= 2, (last_day - first_day) / (counts - 1), np.nan)
+    
+    result = {}
+    for i, patient_id in enumerate(patients):
+        recommendations = []
+        favorite = module_names[np.argmax(pair_counts[i])]
+        
+        if not np.all(np.isnan(module_avg[i])):
+            best = int(np.nanargmin(module_avg[i]))
+            if module_names[best] != favorite and module_avg[i, best] < 0:
+                recommendations.append({
+                    'type': 'module_effectiveness',
+                    'title': 'Наиболее эффективный модуль',
+                    'description': f'"{module_names[best]}" снижает SUD в среднем на '
+                                   f'{-module_avg[i, best]:.1f}; стоит использовать чаще',
+                    'priority': 'medium'
+                })
+            for j in np.flatnonzero(module_avg[i] >= 0):
+                recommendations.append({
+                    'type': 'module_ineffective',
+                    'title': 'Модуль без эффекта',
+                    'description': f'"{module_names[j]}" не снижает SUD ({int(pair_counts[i, j])} сессий); '
+                                   f'пересмотрите параметры',
+                    'priority': 'high'
+                })
+        
+        if slope[i] > TREND_THRESHOLD:
+            recommendations.append({
+                'type': 'sud_trend',
+                'title': 'Рост SUD после сессий',
+                'description': f'post SUD растет на {slope[i]:.1f} за сессию; пересмотрите план терапии',
+                'priority': 'high'
+            })
+        elif slope[i] < -TREND_THRESHOLD:
+            recommendations.append({
+                'type': 'sud_trend',
+                'title': 'Устойчивый прогресс',
+                'description': f'post SUD снижается на {-slope[i]:.1f} за сессию; можно повышать интенсивность экспозиции',
+                'priority': 'low'
+            })
+        
+        # Быстрый доступ к любимому безопасному месту
+        if counts[i] >= 3 and "Безопасное место" in favorite:
+            place = favorite.split(" - ")[-1] if " - " in favorite else "Море"
+            recommendations.append({
+                'type': 'interface_preset',
+                'title': 'Быстрый доступ к безопасному месту',
+                'description': f'Предлагать "{place}" первым в списке',
+                'priority': 'high'
+            })
+        
+        last_session = str(np.datetime64(int(round((last_day[i] - 2440587.5) * 86400)), 's'))
+        interval = None if np.isnan(mean_interval[i]) else round(float(mean_interval[i]), 1)
+        result[patient_id] = (recommendations, last_session, interval)
+    return result
+
+def _overdue_recommendation(last_session, mean_interval, now):
+    if not last_session:
+        return None
+    days_since = (now - datetime.fromisoformat(last_session)).days
+    limit = max(OVERDUE_MIN_DAYS, 2 * (mean_interval or 0))
+    if days_since <= limit:
+        return None
+    return {
+        'type': 'session_frequency',
+        'title': 'Давно не было сессии',
+        'description': f'Последняя сессия {days_since} дн. назад'
+                       + (f' (обычный интервал {mean_interval:.0f} дн.)' if mean_interval else ''),
+        'priority': 'medium'
+    }
+
+
+if __name__ == '__main__':
+    from .database import Database
+    
+    engine = RecommendationEngine(Database(*sys.argv[1:2]))
+    print(f'Пересчитаны рекомендации пациентов: {engine.refresh()}')
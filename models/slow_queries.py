@@ -0,0 +1,122 @@
+"""Журнал медленных SQL-выражений с планом выполнения.
+
+Выражение дольше порога (вместе с fetch*) попадает в журнал: нормализованный текст,
+типы параметров вместо значений, маршрут, из которого оно выполнено, и вывод
+EXPLAIN QUERY PLAN. Статистика копится по нормализованному тексту, чтобы однотипные
+запросы с разными литералами и длиной IN (...) считались одним.
+"""
+import logging
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_COMMENTS = re.compile(r'--[^\n]*')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+MAX_REDACTED_PARAMETERS = 10
+
+def normalize_sql(sql):
+    """Текст без комментариев, лишних пробелов и литералов; списки IN (?, ?, ...) сворачиваются в IN (...)"""
+    sql = ' '.join(_COMMENTS.sub('', sql).split())
+    sql = _LITERALS.sub('?', sql)
+    return _PARAMETER_LISTS.sub('IN (...)', sql)
+
+def _redact_value(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}({len(value)})'
+    return type(value).__name__
+
+def redact_parameters(parameters):
+    """Типы и длины параметров без самих значений (пароли, имена, идентификаторы пациентов)"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        redacted = [f':{name}={_redact_value(value)}' for name, value in parameters.items()]
+    else:
+        redacted = [_redact_value(value) for value in parameters]
+    if len(redacted) > MAX_REDACTED_PARAMETERS:
+        redacted = redacted[:MAX_REDACTED_PARAMETERS] + [f'... всего {len(redacted)}']
+    return redacted
+
+def is_full_scan(plan):
+    """Есть ли в плане полный проход таблицы (SCAN без индекса)"""
+    return any(step.startswith('SCAN ') and ' INDEX ' not in step for step in plan or ())
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=100, max_statements=500, recent_size=200):
+        self.threshold = threshold_ms / 1000
+        self.max_statements = max_statements
+        self.recent = deque(maxlen=recent_size)
+        self._statements = {}  # нормализованный SQL -> сводка
+        self._lock = threading.Lock()
+    
+    def record(self, conn, sql, parameters, elapsed, route):
+        normalized = normalize_sql(sql)
+        with self._lock:
+            entry = self._statements.get(normalized)
+            known_plan = entry['plan'] if entry else None
+        
+        # План одного и того же текста не меняется от вызова к вызову - получаем один раз
+        plan = known_plan if known_plan is not None else self._explain(conn, sql, parameters)
+        redacted = redact_parameters(parameters)
+        seen_at = datetime.now().isoformat(timespec='seconds')
+        
+        with self._lock:
+            entry = self._statements.get(normalized)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    return
+                entry = self._statements[normalized] = {
+                    'sql': normalized, 'count': 0, 'total_time': 0.0, 'max_time': 0.0,
+                    'routes': {}, 'plan': None, 'full_scan': False
+                }
+            entry['count'] += 1
+            entry['total_time'] += elapsed
+            entry['max_time'] = max(entry['max_time'], elapsed)
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            entry['parameters'] = redacted
+            entry['last_seen'] = seen_at
+            if entry['plan'] is None and plan is not None:
+                entry['plan'] = plan
+                entry['full_scan'] = is_full_scan(plan)
+            self.recent.append({'sql': normalized, 'time': elapsed, 'route': route,
+                                'parameters': redacted, 'seen_at': seen_at})
+        
+        logger.warning('Медленный запрос %.1f мс [%s]: %s%s', elapsed * 1000, route, normalized,
+                       f" | план: {'; '.join(plan)}" if plan else '')
+    
+    @staticmethod
+    def _explain(conn, sql, parameters):
+        # executemany/executescript и служебные выражения плана не имеют
+        if parameters is None:
+            return None
+        try:
+            # Базовый execute: сам EXPLAIN в учет и журнал не попадает
+            rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+        except sqlite3.Error:
+            return None
+        return [row[3] for row in rows]
+    
+    def top(self, limit=20):
+        """Самые затратные выражения по суммарному времени"""
+        with self._lock:
+            entries = [dict(entry, routes=dict(entry['routes'])) for entry in self._statements.values()]
+        entries.sort(key=lambda entry: entry['total_time'], reverse=True)
+        return entries[:limit]
+    
+    def latest(self):
+        """Последние медленные выражения, новые первыми"""
+        with self._lock:
+            return list(reversed(self.recent))
+    
+    def clear(self):
+        with self._lock:
+            self._statements.clear()
+            self.recent.clear()
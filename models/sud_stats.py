@@ -0,0 +1,193 @@
+"""Накопительная статистика SUD по пациентам, терапевтам и модулям.
+
+Суммы и счетчики поддерживаются триггерами на therapy_sessions (и на смену
+терапевта пациента в users), поэтому
+чтение статистики - одна строка вместо прохода по всем сессиям.
+Пересчет с нуля для сверки:
+
+    python -m models.sud_stats check|rebuild [путь_к_бд]
+"""
+import sys
+
+ROLLUP_COLUMNS = ('session_count', 'sum_pre_sud', 'sum_post_sud', 'sum_duration')
+
+# Таблица сводки, ключ и выражение ключа для строки сессии (NEW/OLD подставляется)
+ROLLUPS = (
+    ('sud_stats_patient', 'patient_id', '{row}.patient_id'),
+    ('sud_stats_therapist', 'therapist_id',
+     '(SELECT therapist_id FROM users WHERE user_id = {row}.patient_id)'),
+    ('sud_stats_module', 'module_used', '{row}.module_used'),
+)
+
+
+def _apply_row_sql(table, key, key_expr, row, sign):
+    """Добавляет (sign=+1) или вычитает (sign=-1) строку сессии из сводки"""
+    key_value = key_expr.format(row=row)
+    op = '+' if sign > 0 else '-'
+    return f'''
+        INSERT INTO {table} ({key}, {', '.join(ROLLUP_COLUMNS)})
+        SELECT {key_value}, {sign}, {sign} * {row}.pre_sud, {sign} * {row}.post_sud,
+               {sign} * {row}.duration_minutes
+        WHERE {key_value} IS NOT NULL
+        ON CONFLICT ({key}) DO UPDATE SET
+            session_count = session_count {op} 1,
+            sum_pre_sud = sum_pre_sud {op} {row}.pre_sud,
+            sum_post_sud = sum_post_sud {op} {row}.post_sud,
+            sum_duration = sum_duration {op} {row}.duration_minutes;
+    '''
+
+
+def _move_patient_sql(row, sign):
+    """Добавляет (sign=+1) или вычитает (sign=-1) сводку пациента из сводки терапевта {row}.therapist_id"""
+    return f'''
+        INSERT INTO sud_stats_therapist (therapist_id, {', '.join(ROLLUP_COLUMNS)})
+        SELECT {row}.therapist_id, {', '.join(f'{sign} * p.{column}' for column in ROLLUP_COLUMNS)}
+        FROM sud_stats_patient p
+        WHERE p.patient_id = NEW.user_id AND {row}.therapist_id IS NOT NULL
+        ON CONFLICT (therapist_id) DO UPDATE SET
+            {', '.join(f'{column} = {column} + excluded.{column}' for column in ROLLUP_COLUMNS)};
+    '''
+
+
+def create_reassignment_trigger(cursor):
+    """Переносит сессии пациента в сводку нового терапевта при смене привязки"""
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sud_stats_reassign
+        AFTER UPDATE OF therapist_id ON users
+        WHEN OLD.therapist_id IS NOT NEW.therapist_id
+        BEGIN {_move_patient_sql('OLD', -1)} {_move_patient_sql('NEW', 1)} END
+    ''')
+
+
+def create_rollup_triggers(cursor):
+    add_new = ''.join(_apply_row_sql(t, k, e, 'NEW', 1) for t, k, e in ROLLUPS)
+    remove_old = ''.join(_apply_row_sql(t, k, e, 'OLD', -1) for t, k, e in ROLLUPS)
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sud_stats_insert AFTER INSERT ON therapy_sessions
+        BEGIN {add_new} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sud_stats_delete AFTER DELETE ON therapy_sessions
+        BEGIN {remove_old} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sud_stats_update
+        AFTER UPDATE OF patient_id, module_used, pre_sud, post_sud, duration_minutes ON therapy_sessions
+        BEGIN {remove_old} {add_new} END
+    ''')
+    create_reassignment_trigger(cursor)
+
+
+def _recompute_sql(key, group_expr, join=''):
+    return f'''
+        SELECT {group_expr} AS {key}, COUNT(*), SUM(s.pre_sud), SUM(s.post_sud), SUM(s.duration_minutes)
+        FROM therapy_sessions s {join}
+        WHERE {group_expr} IS NOT NULL
+        GROUP BY {group_expr}
+    '''
+
+
+RECOMPUTE = (
+    ('sud_stats_patient', 'patient_id', _recompute_sql('patient_id', 's.patient_id')),
+    ('sud_stats_therapist', 'therapist_id',
+     _recompute_sql('therapist_id', 'u.therapist_id', 'JOIN users u ON u.user_id = s.patient_id')),
+    ('sud_stats_module', 'module_used', _recompute_sql('module_used', 's.module_used')),
+)
+
+
+def rebuild_rollups(cursor):
+    """Пересчитывает все сводки по текущим сессиям и привязке пациентов к терапевтам"""
+    for table, key, select_sql in RECOMPUTE:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'INSERT INTO {table} ({key}, {", ".join(ROLLUP_COLUMNS)}) {select_sql}')
+
+
+def _to_stats(row):
+    if not row or not row[0]:
+        return {'session_count': 0, 'avg_pre_sud': 0, 'avg_post_sud': 0,
+                'avg_sud_reduction': 0, 'avg_duration': 0}
+    session_count, sum_pre, sum_post, sum_duration = row
+    return {
+        'session_count': session_count,
+        'avg_pre_sud': sum_pre / session_count,
+        'avg_post_sud': sum_post / session_count,
+        'avg_sud_reduction': (sum_post - sum_pre) / session_count,
+        'avg_duration': sum_duration / session_count
+    }
+
+
+class SudStatsManager:
+    def __init__(self, db):
+        self.db = db
+    
+    def _get_row(self, table, key, value):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(ROLLUP_COLUMNS)} FROM {table} WHERE {key} = ?
+            ''', (value,))
+            return cursor.fetchone()
+    
+    def get_patient_stats(self, patient_id):
+        return _to_stats(self._get_row('sud_stats_patient', 'patient_id', patient_id))
+    
+    def get_therapist_stats(self, therapist_id):
+        return _to_stats(self._get_row('sud_stats_therapist', 'therapist_id', therapist_id))
+    
+    def get_module_stats(self):
+        """Статистика по каждому модулю: {module_used: {...}}"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT module_used, {", ".join(ROLLUP_COLUMNS)} FROM sud_stats_module')
+            rows = cursor.fetchall()
+        return {row[0]: _to_stats(row[1:]) for row in rows}
+    
+    def get_overall_stats(self):
+        """Статистика по всем сессиям (сумма по модулям)"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(f'SUM({column})' for column in ROLLUP_COLUMNS)} FROM sud_stats_module
+            ''')
+            return _to_stats(cursor.fetchone())
+    
+    def rebuild(self):
+        with self.db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rebuild_rollups(conn.cursor())
+    
+    def find_mismatches(self):
+        """Сверяет сводки с пересчетом с нуля. Возвращает [(таблица, ключ, хранимое, расчетное)]"""
+        mismatches = []
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for table, key, select_sql in RECOMPUTE:
+                cursor.execute(select_sql)
+                expected = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+                cursor.execute(f'SELECT {key}, {", ".join(ROLLUP_COLUMNS)} FROM {table}')
+                # Нулевые строки остаются после удаления всех сессий ключа
+                stored = {row[0]: tuple(row[1:]) for row in cursor.fetchall() if row[1]}
+                for value in expected.keys() | stored.keys():
+                    if expected.get(value) != stored.get(value):
+                        mismatches.append((table, value, stored.get(value), expected.get(value)))
+        return mismatches
+
+
+if __name__ == '__main__':
+    from .database import Database
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    stats = SudStatsManager(Database(*sys.argv[2:3]))
+    if command == 'rebuild':
+        stats.rebuild()
+        print('Статистика SUD пересчитана')
+    elif command == 'check':
+        mismatches = stats.find_mismatches()
+        for table, value, stored, expected in mismatches:
+            print(f'{table}[{value}]: хранится {stored}, ожидается {expected}')
+        print(f'Расхождений: {len(mismatches)}')
+        sys.exit(1 if mismatches else 0)
+    else:
+        print('Использование: python -m models.sud_stats check|rebuild [путь_к_бд]')
+        sys.exit(2)
@@ -1,74 +1,111 @@
-import json
-
-class TestManager:
-    def __init__(self, db):
-        self.db = db
-    
-    def get_test_questions(self, question_type=None):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        if question_type:
-            cursor.execute('''
-                SELECT id, question_text, options, correct_answer, explanation, question_type
-                FROM test_questions WHERE question_type = ?
-            ''', (question_type,))
-        else:
-            cursor.execute('''
-                SELECT id, question_text, options, correct_answer, explanation, question_type
-                FROM test_questions
-            ''')
-        
-        questions = []
-        for row in cursor.fetchall():
-            questions.append({
-                'id': row[0],
-                'question_text': row[1],
-                'options': json.loads(row[2]),
-                'correct_answer': row[3],
-                'explanation': row[4],
-                'question_type': row[5]
-            })
-        
-        conn.close()
-        return questions
-    
-    def evaluate_test(self, answers):
-        """Оценивает тест и возвращает результат"""
-        questions = self.get_test_questions()
-        total_questions = len(questions)
-        correct_answers = 0
-        
-        for question in questions:
-            question_id = str(question['id'])
-            if question_id in answers and int(answers[question_id]) == question['correct_answer']:
-                correct_answers += 1
-        
-        score = (correct_answers / total_questions) * 100
-        passed = score >= 80  # 80% для прохождения
-        
-        return {
-            'total_questions': total_questions,
-            'correct_answers': correct_answers,
-            'score': round(score, 1),
-            'passed': passed,
-            'answers_detail': self.get_answers_detail(questions, answers)
-        }
-    
-    def get_answers_detail(self, questions, user_answers):
-        """Возвращает детальную информацию по ответам"""
-        detail = []
-        for question in questions:
-            question_id = str(question['id'])
-            user_answer = int(user_answers.get(question_id, -1))
-            is_correct = user_answer == question['correct_answer']
-            
-            detail.append({
-                'question': question['question_text'],
-                'user_answer': question['options'][user_answer] if user_answer != -1 else 'Не отвечено',
-                'correct_answer': question['options'][question['correct_answer']],
-                'is_correct': is_correct,
-                'explanation': question['explanation']
-            })
-        
-        return detail
\ No newline at end of file
+import json
+import threading
+
+class QuestionBank:
+    """Предкомпилированный банк вопросов: разобранные варианты, ключ ответов и индексы по типу"""
+    
+    def __init__(self, version, rows):
+        self.version = version
+        self.questions = []
+        self.by_id = {}          # str(id) -> вопрос (ключи совпадают с полями формы)
+        self.answer_key = {}     # str(id) -> индекс правильного ответа
+        self.by_type = {}
+        
+        for row in rows:
+            question = {
+                'id': row[0],
+                'question_text': row[1],
+                'options': json.loads(row[2]),
+                'correct_answer': row[3],
+                'explanation': row[4],
+                'question_type': row[5]
+            }
+            question_id = str(question['id'])
+            self.questions.append(question)
+            self.by_id[question_id] = question
+            self.answer_key[question_id] = question['correct_answer']
+            self.by_type.setdefault(question['question_type'], []).append(question)
+
+class TestManager:
+    def __init__(self, db):
+        self.db = db
+        self._bank = None
+        self._bank_lock = threading.Lock()
+    
+    def get_question_bank(self):
+        """Актуальный банк вопросов; пересобирается, только если изменилась версия test_questions"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM data_versions WHERE name = 'test_questions'")
+            row = cursor.fetchone()
+            version = row[0] if row else 0
+            
+            bank = self._bank
+            if bank is not None and bank.version == version:
+                return bank
+            
+            with self._bank_lock:
+                if self._bank is None or self._bank.version != version:
+                    cursor.execute('''
+                        SELECT id, question_text, options, correct_answer, explanation, question_type
+                        FROM test_questions ORDER BY id
+                    ''')
+                    self._bank = QuestionBank(version, cursor.fetchall())
+                return self._bank
+    
+    def get_test_questions(self, question_type=None):
+        bank = self.get_question_bank()
+        if question_type:
+            return list(bank.by_type.get(question_type, []))
+        return list(bank.questions)
+    
+    def evaluate_test(self, answers, question_ids=None):
+        """Оценивает тест и возвращает результат.
+        
+        question_ids - вопросы, выданные в тесте (хранятся на сервере); без него тест считается
+        по всему банку. Засчитываются только ответы на вопросы из этого набора.
+        """
+        bank = self.get_question_bank()
+        if question_ids is None:
+            question_ids = list(bank.by_id)
+        else:
+            question_ids = [question_id for question_id in dict.fromkeys(map(str, question_ids))
+                            if question_id in bank.by_id]
+        if not question_ids:
+            raise ValueError('Нет вопросов для оценки теста')
+        total_questions = len(question_ids)
+        
+        correct_answers = 0
+        for question_id in question_ids:
+            answer = answers.get(question_id)
+            if answer is not None and int(answer) == bank.answer_key[question_id]:
+                correct_answers += 1
+        
+        score = (correct_answers / total_questions) * 100
+        passed = score >= 80  # 80% для прохождения
+        
+        return {
+            'total_questions': total_questions,
+            'correct_answers': correct_answers,
+            'score': round(score, 1),
+            'passed': passed,
+            'answers_detail': self.get_answers_detail(bank, answers, question_ids)
+        }
+    
+    def get_answers_detail(self, bank, user_answers, question_ids):
+        """Возвращает детальную информацию по ответам на выданные вопросы"""
+        detail = []
+        for question_id in question_ids:
+            question = bank.by_id[question_id]
+            user_answer = int(user_answers.get(question_id, -1))
+            is_correct = user_answer == question['correct_answer']
+            
+            detail.append({
+                'question': question['question_text'],
+                'user_answer': question['options'][user_answer] if user_answer != -1 else 'Не отвечено',
+                'correct_answer': question['options'][question['correct_answer']],
+                'is_correct': is_correct,
+                'explanation': question['explanation']
+            })
+        
+        return detail
@@ -1,82 +1,181 @@
-from datetime import datetime
-
-class Session:
-    def __init__(self, session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters=None):
-        self.session_id = session_id
-        self.patient_id = patient_id
-        self.date = date
-        self.duration_minutes = duration_minutes
-        self.module_used = module_used
-        self.pre_sud = pre_sud
-        self.post_sud = post_sud
-        self.parameters = parameters or {}
-    
-    def to_dict(self):
-        return {
-            'session_id': self.session_id,
-            'patient_id': self.patient_id,
-            'date': self.date,
-            'duration_minutes': self.duration_minutes,
-            'module_used': self.module_used,
-            'pre_sud': self.pre_sud,
-            'post_sud': self.post_sud,
-            'parameters': self.parameters
-        }
-
-class TherapyDataManager:
-    def __init__(self, db):
-        self.db = db
-    
-    def get_sessions_by_patient(self, patient_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters
-            FROM therapy_sessions WHERE patient_id = ? ORDER BY date
-        ''', (patient_id,))
-        rows = cursor.fetchall()
-        conn.close()
-        
-        sessions = []
-        for row in rows:
-            sessions.append(Session(*row))
-        return sessions
-    
-    def get_all_sessions(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters
-            FROM therapy_sessions ORDER BY date
-        ''')
-        rows = cursor.fetchall()
-        conn.close()
-        
-        sessions = []
-        for row in rows:
-            sessions.append(Session(*row))
-        return sessions
-    
-    def get_patient_preferences(self, patient_id):
-        patient_sessions = self.get_sessions_by_patient(patient_id)
-        if not patient_sessions:
-            return {}
-        
-        module_counts = {}
-        safe_place_prefs = {}
-        
-        for session in patient_sessions:
-            module = session.module_used
-            module_counts[module] = module_counts.get(module, 0) + 1
-            
-            if "Безопасное место" in module:
-                place = module.split(" - ")[-1] if " - " in module else "default"
-                safe_place_prefs[place] = safe_place_prefs.get(place, 0) + 1
-        
-        return {
-            'favorite_module': max(module_counts, key=module_counts.get) if module_counts else "EMDR",
-            'module_counts': module_counts,
-            'safe_place_preferences': safe_place_prefs,
-            'total_sessions': len(patient_sessions),
-            'avg_sud_reduction': sum(s.post_sud - s.pre_sud for s in patient_sessions) / len(patient_sessions)
+import json
+from datetime import datetime
+
+from .pagination import encode_cursor, decode_cursor
+
+# Максимум идентификаторов в одном IN (...) - ниже лимита параметров SQLite
+PATIENT_BATCH_SIZE = 500
+
+class Session:
+    def __init__(self, session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters=None):
+        self.session_id = session_id
+        self.patient_id = patient_id
+        self.date = date
+        self.duration_minutes = duration_minutes
+        self.module_used = module_used
+        self.pre_sud = pre_sud
+        self.post_sud = post_sud
+        self.parameters = parameters or {}
+    
+    def to_dict(self):
+        return {
+            'session_id': self.session_id,
+            'patient_id': self.patient_id,
+            'date': self.date,
+            'duration_minutes': self.duration_minutes,
+            'module_used': self.module_used,
+            'pre_sud': self.pre_sud,
+            'post_sud': self.post_sud,
+            'parameters': self.parameters
+        }
+
+class TherapyDataManager:
+    def __init__(self, db):
+        self.db = db
+    
+    def get_sessions_by_patient(self, patient_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters
+                FROM therapy_sessions WHERE patient_id = ? ORDER BY date
+            ''', (patient_id,))
+            rows = cursor.fetchall()
+        
+        sessions = []
+        for row in rows:
+            sessions.append(Session(*row))
+        return sessions
+    
+    def get_recent_sessions(self, patient_id, limit=3):
+        """Последние сессии пациента, новые первыми"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters
+                FROM therapy_sessions WHERE patient_id = ? ORDER BY date DESC, id DESC LIMIT ?
+            ''', (patient_id, limit))
+            return [Session(*row) for row in cursor.fetchall()]
+    
+    def get_sessions_page(self, patient_id, after=None, limit=100):
+        """Страница истории пациента по (date, id): ([Session, ...], курсор следующей страницы или None)"""
+        rows, next_cursor = self._fetch_page(patient_id, after, limit)
+        return [Session(*row[1:]) for row in rows], next_cursor
+    
+    def get_sessions_columns(self, patient_id, after=None, limit=100):
+        """Та же страница в колонках для графиков: параллельные списки и словарь модулей (module - индекс в modules)"""
+        rows, next_cursor = self._fetch_page(patient_id, after, limit)
+        columns = {'date': [], 'pre_sud': [], 'post_sud': [], 'duration': [], 'module': [], 'modules': []}
+        module_codes = {}
+        for row in rows:
+            columns['date'].append(row[3])
+            columns['duration'].append(row[4])
+            columns['module'].append(module_codes.setdefault(row[5], len(module_codes)))
+            columns['pre_sud'].append(row[6])
+            columns['post_sud'].append(row[7])
+        columns['modules'] = list(module_codes)
+        return columns, next_cursor
+    
+    def _fetch_page(self, patient_id, after, limit):
+        params = [patient_id]
+        keyset = ''
+        if after is not None:
+            keyset = 'AND (date, id) > (?, ?)'
+            params.extend(decode_cursor(after, 2))
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters
+                FROM therapy_sessions WHERE patient_id = ? {keyset} ORDER BY date, id LIMIT ?
+            ''', params + [limit + 1])
+            rows = cursor.fetchall()
+        
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1][3], page[-1][0]) if len(rows) > limit else None
+        return page, next_cursor
+    
+    def get_patient_version(self, patient_id):
+        """(версия истории сессий, unix-время изменения) пациента; (0, None), если сессий не было"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT version, updated_at FROM patient_versions WHERE patient_id = ?', (patient_id,))
+            row = cursor.fetchone()
+        return tuple(row) if row else (0, None)
+    
+    def get_sessions_for_patients(self, patient_ids):
+        """Сессии нескольких пациентов пакетными запросами: {patient_id: [Session, ...]}"""
+        patient_ids = list(dict.fromkeys(patient_ids))
+        sessions_by_patient = {patient_id: [] for patient_id in patient_ids}
+        if not patient_ids:
+            return sessions_by_patient
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(patient_ids), PATIENT_BATCH_SIZE):
+                batch = patient_ids[start:start + PATIENT_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                cursor.execute(f'''
+                    SELECT session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters
+                    FROM therapy_sessions WHERE patient_id IN ({placeholders}) ORDER BY patient_id, date
+                ''', batch)
+                for row in cursor:
+                    sessions_by_patient[row[1]].append(Session(*row))
+        
+        return sessions_by_patient
+    
+    def get_all_sessions(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters
+                FROM therapy_sessions ORDER BY date
+            ''')
+            rows = cursor.fetchall()
+        
+        sessions = []
+        for row in rows:
+            sessions.append(Session(*row))
+        return sessions
+    
+    def add_sessions(self, sessions):
+        """Записывает завершенные сессии одним executemany (в транзакции вызывающего, если она есть)"""
+        rows = [
+            (s.session_id, s.patient_id, s.date, s.duration_minutes, s.module_used,
+             s.pre_sud, s.post_sud, json.dumps(s.parameters, ensure_ascii=False) if s.parameters else None)
+            for s in sessions
+        ]
+        with self.db.connection() as conn:
+            conn.executemany('''
+                INSERT OR IGNORE INTO therapy_sessions
+                    (session_id, patient_id, date, duration_minutes, module_used, pre_sud, post_sud, parameters)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+    
+    def get_patient_preferences(self, patient_id):
+        """Предпочтения пациента из материализованной строки (см. models/patient_preferences.py)"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT module_counts, session_count, sum_sud_reduction
+                FROM patient_preferences WHERE patient_id = ?
+            ''', (patient_id,))
+            row = cursor.fetchone()
+        
+        if not row or not row[1]:
+            return {}
+        
+        module_counts = json.loads(row[0])
+        safe_place_prefs = {}
+        for module, count in module_counts.items():
+            if "Безопасное место" in module:
+                place = module.split(" - ")[-1] if " - " in module else "default"
+                safe_place_prefs[place] = safe_place_prefs.get(place, 0) + count
+        
+        return {
+            'favorite_module': max(module_counts, key=module_counts.get) if module_counts else "EMDR",
+            'module_counts': module_counts,
+            'safe_place_preferences': safe_place_prefs,
+            'total_sessions': row[1],
+            'avg_sud_reduction': row[2] / row[1]
         }
\ No newline at end of file
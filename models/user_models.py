@@ -1,190 +1,339 @@
-from datetime import datetime, timedelta
-import secrets
-import string
-
-class User:
-    def __init__(self, user_id, username, password_hash, role, name, therapist_id=None, is_active=True, created_date=None):
-        self.user_id = user_id
-        self.username = username
-        self.password_hash = password_hash
-        self.role = role
-        self.name = name
-        self.therapist_id = therapist_id
-        self.is_active = is_active
-        
-        # Конвертируем created_date в datetime объект если это строка
-        if isinstance(created_date, str):
-            try:
-                self.created_date = datetime.fromisoformat(created_date.replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                self.created_date = datetime.now()
-        else:
-            self.created_date = created_date or datetime.now()
-    
-    @staticmethod
-    def generate_credentials():
-        """Генерация логина и пароля для пациентов"""
-        username = 'pt' + ''.join(secrets.choice(string.digits) for _ in range(6))
-        password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(8))
-        return username, password
-    
-    @staticmethod
-    def generate_therapist_credentials():
-        """Генерация логина и пароля для терапевтов"""
-        username = 'doc' + ''.join(secrets.choice(string.digits) for _ in range(4))
-        password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(10))
-        return username, password
-
-class TherapistLicense:
-    def __init__(self, therapist_id, license_type='basic', is_active=False, test_passed=False, 
-                 test_score=0, test_date=None, license_expires=None, created_date=None):
-        self.therapist_id = therapist_id
-        self.license_type = license_type
-        self.is_active = is_active
-        self.test_passed = test_passed
-        self.test_score = test_score
-        
-        # Конвертируем даты из строк в datetime объекты
-        if isinstance(test_date, str):
-            try:
-                self.test_date = datetime.fromisoformat(test_date.replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                self.test_date = None
-        else:
-            self.test_date = test_date
-            
-        if isinstance(license_expires, str):
-            try:
-                self.license_expires = datetime.fromisoformat(license_expires.replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                self.license_expires = None
-        else:
-            self.license_expires = license_expires
-            
-        if isinstance(created_date, str):
-            try:
-                self.created_date = datetime.fromisoformat(created_date.replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                self.created_date = datetime.now()
-        else:
-            self.created_date = created_date or datetime.now()
-    
-    def is_valid(self):
-        if not self.is_active or not self.test_passed:
-            return False
-        if self.license_expires and datetime.now() > self.license_expires:
-            return False
-        return True
-    
-    def days_until_expiry(self):
-        if not self.license_expires:
-            return None
-        delta = self.license_expires - datetime.now()
-        return delta.days
-
-class UserManager:
-    def __init__(self, db):
-        self.db = db
-        # Временное хранилище для паролей (в продакшене использовать безопасное хранилище)
-        self.temp_passwords = {}
-    
-    def get_user_by_username(self, username):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT user_id, username, password_hash, role, name, therapist_id, is_active, created_date
-            FROM users WHERE username = ? AND is_active = 1
-        ''', (username,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return User(*row)
-        return None
-    
-    def get_user_by_id(self, user_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT user_id, username, password_hash, role, name, therapist_id, is_active, created_date
-            FROM users WHERE user_id = ? AND is_active = 1
-        ''', (user_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return User(*row)
-        return None
-    
-    def get_patients_by_therapist(self, therapist_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT user_id, username, password_hash, role, name, therapist_id, is_active, created_date
-            FROM users WHERE therapist_id = ? AND role = 'patient' AND is_active = 1
-        ''', (therapist_id,))
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [User(*row) for row in rows]
-    
-    def create_patient(self, name, therapist_id):
-        username, password = User.generate_credentials()
-        user_id = f"PT{self.get_next_patient_id():03d}"
-        password_hash = self.db.hash_password(password)
-        
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO users (user_id, username, password_hash, role, name, therapist_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, username, password_hash, 'patient', name, therapist_id))
-        conn.commit()
-        conn.close()
-        
-        # Сохраняем пароль во временном хранилище
-        self.temp_passwords[user_id] = password
-        
-        patient = self.get_user_by_id(user_id)
-        return patient, username, password
-    
-    def get_patient_password(self, patient_id):
-        """Получить пароль пациента (только для что созданных)"""
-        return self.temp_passwords.get(patient_id)
-    
-    def create_therapist(self, name):
-        """Создание терапевта (для суперадмина)"""
-        username, password = User.generate_therapist_credentials()
-        user_id = f"TH{self.get_next_therapist_id():03d}"
-        password_hash = self.db.hash_password(password)
-        
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO users (user_id, username, password_hash, role, name)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, username, password_hash, 'therapist', name))
-        conn.commit()
-        conn.close()
-        
-        therapist = self.get_user_by_id(user_id)
-        return therapist, username, password
-    
-    def get_next_patient_id(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'patient'")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count + 1
-    
-    def get_next_therapist_id(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'therapist'")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count + 1
-    
-    def verify_password(self, user, password):
-        return self.db.verify_password(password, user.password_hash)
\ No newline at end of file
+from concurrent.futures import TimeoutError as FuturesTimeout
+from datetime import datetime, timedelta
+import secrets
+import string
+
+from .pagination import encode_cursor, decode_cursor
+from .passwords import HasherBusy, PasswordHasher
+
+class User:
+    def __init__(self, user_id, username, password_hash, role, name, therapist_id=None, is_active=True, created_date=None):
+        self.user_id = user_id
+        self.username = username
+        self.password_hash = password_hash
+        self.role = role
+        self.name = name
+        self.therapist_id = therapist_id
+        self.is_active = is_active
+        
+        # Конвертируем created_date в datetime объект если это строка
+        if isinstance(created_date, str):
+            try:
+                self.created_date = datetime.fromisoformat(created_date.replace('Z', '+00:00'))
+            except (ValueError, AttributeError):
+                self.created_date = datetime.now()
+        else:
+            self.created_date = created_date or datetime.now()
+    
+    @staticmethod
+    def generate_credentials():
+        """Генерация логина и пароля для пациентов"""
+        username = 'pt' + ''.join(secrets.choice(string.digits) for _ in range(6))
+        password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(8))
+        return username, password
+    
+    @staticmethod
+    def generate_therapist_credentials():
+        """Генерация логина и пароля для терапевтов"""
+        username = 'doc' + ''.join(secrets.choice(string.digits) for _ in range(4))
+        password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(10))
+        return username, password
+
+class TherapistLicense:
+    def __init__(self, therapist_id, license_type='basic', is_active=False, test_passed=False, 
+                 test_score=0, test_date=None, license_expires=None, created_date=None):
+        self.therapist_id = therapist_id
+        self.license_type = license_type
+        self.is_active = is_active
+        self.test_passed = test_passed
+        self.test_score = test_score
+        
+        # Конвертируем даты из строк в datetime объекты
+        if isinstance(test_date, str):
+            try:
+                self.test_date = datetime.fromisoformat(test_date.replace('Z', '+00:00'))
+            except (ValueError, AttributeError):
+                self.test_date = None
+        else:
+            self.test_date = test_date
+            
+        if isinstance(license_expires, str):
+            try:
+                self.license_expires = datetime.fromisoformat(license_expires.replace('Z', '+00:00'))
+            except (ValueError, AttributeError):
+                self.license_expires = None
+        else:
+            self.license_expires = license_expires
+            
+        if isinstance(created_date, str):
+            try:
+                self.created_date = datetime.fromisoformat(created_date.replace('Z', '+00:00'))
+            except (ValueError, AttributeError):
+                self.created_date = datetime.now()
+        else:
+            self.created_date = created_date or datetime.now()
+    
+    def is_valid(self):
+        if not self.is_active or not self.test_passed:
+            return False
+        if self.license_expires and datetime.now() > self.license_expires:
+            return False
+        return True
+    
+    def days_until_expiry(self):
+        if not self.license_expires:
+            return None
+        delta = self.license_expires - datetime.now()
+        return delta.days
+
+class UserManager:
+    def __init__(self, db, cache=None, hasher=None):
+        self.db = db
+        # Пул хэширования паролей (scrypt), см. models/passwords.py
+        self.hasher = hasher or PasswordHasher()
+        # Кэш активных пользователей по (версия users, 'id', user_id) и (версия users, 'username',
+        # username); None - без кэша. Версию меняет триггер на любую запись в users, поэтому
+        # смена пароля или блокировка в одном процессе видна кэшам всех остальных
+        self.cache = cache
+        # Временное хранилище для паролей (в продакшене использовать безопасное хранилище)
+        self.temp_passwords = {}
+    
+    def _get_version(self, cursor):
+        cursor.execute("SELECT version FROM data_versions WHERE name = 'users'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    def get_user_by_username(self, username):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            # Версию читаем до строки: иначе старая строка могла бы попасть в кэш под новой версией
+            version = self._get_version(cursor)
+            if self.cache is not None:
+                user = self.cache.get((version, 'username', username))
+                if user is not None:
+                    return user
+            
+            cursor.execute('''
+                SELECT user_id, username, password_hash, role, name, therapist_id, is_active, created_date
+                FROM users WHERE username = ? AND is_active = 1
+            ''', (username,))
+            row = cursor.fetchone()
+        
+        if row:
+            return self._cache_user(version, User(*row))
+        return None
+    
+    def get_user_by_id(self, user_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            version = self._get_version(cursor)
+            if self.cache is not None:
+                user = self.cache.get((version, 'id', user_id))
+                if user is not None:
+                    return user
+            
+            cursor.execute('''
+                SELECT user_id, username, password_hash, role, name, therapist_id, is_active, created_date
+                FROM users WHERE user_id = ? AND is_active = 1
+            ''', (user_id,))
+            row = cursor.fetchone()
+        
+        if row:
+            return self._cache_user(version, User(*row))
+        return None
+    
+    def _cache_user(self, version, user):
+        if self.cache is not None:
+            self.cache.set((version, 'id', user.user_id), user)
+            self.cache.set((version, 'username', user.username), user)
+        return user
+    
+    def toggle_user_status(self, user_id):
+        """Активирует/деактивирует пользователя. Возвращает новый статус или None, если не найден"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT is_active FROM users WHERE user_id = ?', (user_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            new_status = 0 if row[0] else 1
+            cursor.execute('UPDATE users SET is_active = ? WHERE user_id = ?', (new_status, user_id))
+        
+        return bool(new_status)
+    
+    def reset_password(self, user_id):
+        """Генерирует и сохраняет новый пароль пользователя"""
+        new_password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(8))
+        new_password_hash = self.hasher.hash(new_password)
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'UPDATE users SET password_hash = ? WHERE user_id = ?',
+                (new_password_hash, user_id)
+            )
+        
+        self.temp_passwords[user_id] = new_password
+        return new_password
+    
+    def get_patients_by_therapist(self, therapist_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT user_id, username, password_hash, role, name, therapist_id, is_active, created_date
+                FROM users WHERE therapist_id = ? AND role = 'patient' AND is_active = 1
+            ''', (therapist_id,))
+            rows = cursor.fetchall()
+        
+        return [User(*row) for row in rows]
+    
+    def list_users(self, role=None, is_active=None, after=None, limit=50):
+        """Страница пользователей по user_id: ([User, ...], курсор следующей страницы или None)"""
+        conditions, params = [], []
+        if role is not None:
+            conditions.append('role = ?')
+            params.append(role)
+        if is_active is not None:
+            conditions.append('is_active = ?')
+            params.append(1 if is_active else 0)
+        if after is not None:
+            (last_user_id,) = decode_cursor(after, 1)
+            conditions.append('user_id > ?')
+            params.append(last_user_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        # Читаем на одну строку больше, чтобы узнать, есть ли следующая страница
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT user_id, username, password_hash, role, name, therapist_id, is_active, created_date
+                FROM users {where} ORDER BY user_id LIMIT ?
+            ''', params + [limit + 1])
+            rows = cursor.fetchall()
+        
+        users = [User(*row) for row in rows[:limit]]
+        next_cursor = encode_cursor(users[-1].user_id) if len(rows) > limit else None
+        return users, next_cursor
+    
+    def count_users_by_role(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT role, COUNT(*) FROM users GROUP BY role')
+            return dict(cursor.fetchall())
+    
+    def create_patient(self, name, therapist_id):
+        username, password = User.generate_credentials()
+        password_hash = self.hasher.hash(password)
+        
+        with self.db.connection() as conn:
+            user_id = f"PT{self.get_next_patient_id():03d}"
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO users (user_id, username, password_hash, role, name, therapist_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, username, password_hash, 'patient', name, therapist_id))
+        
+        # Сохраняем пароль во временном хранилище
+        self.temp_passwords[user_id] = password
+        
+        patient = self.get_user_by_id(user_id)
+        return patient, username, password
+    
+    def create_patients(self, names, therapist_id):
+        """Массовое создание пациентов одной транзакцией. Возвращает [(user_id, name, username, password), ...]"""
+        if not names:
+            return []
+        
+        passwords = [User.generate_credentials()[1] for _ in names]
+        password_hashes = self.hasher.hash_many(passwords)
+        
+        with self.db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            usernames = self._unique_usernames(conn, len(names))
+            user_ids = [f"PT{number:03d}" for number in self.allocate_ids('PT', len(names))]
+            conn.executemany('''
+                INSERT INTO users (user_id, username, password_hash, role, name, therapist_id)
+                VALUES (?, ?, ?, 'patient', ?, ?)
+            ''', [
+                (user_id, username, password_hash, name, therapist_id)
+                for user_id, username, password_hash, name in zip(user_ids, usernames, password_hashes, names)
+            ])
+        
+        created = list(zip(user_ids, names, usernames, passwords))
+        for user_id, _, _, password in created:
+            self.temp_passwords[user_id] = password
+        return created
+    
+    def _unique_usernames(self, conn, count):
+        """Логины пациентов без повторов внутри пачки и с уже существующими"""
+        usernames = set()
+        while len(usernames) < count:
+            candidates = {User.generate_credentials()[0] for _ in range(count - len(usernames))} - usernames
+            placeholders = ', '.join('?' * len(candidates))
+            taken = {row[0] for row in conn.execute(
+                f'SELECT username FROM users WHERE username IN ({placeholders})', list(candidates)
+            )}
+            usernames |= candidates - taken
+        return list(usernames)
+    
+    def get_patient_password(self, patient_id):
+        """Получить пароль пациента (только для что созданных)"""
+        return self.temp_passwords.get(patient_id)
+    
+    def create_therapist(self, name):
+        """Создание терапевта (для суперадмина)"""
+        username, password = User.generate_therapist_credentials()
+        password_hash = self.hasher.hash(password)
+        
+        with self.db.connection() as conn:
+            user_id = f"TH{self.get_next_therapist_id():03d}"
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO users (user_id, username, password_hash, role, name)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, username, password_hash, 'therapist', name))
+        
+        therapist = self.get_user_by_id(user_id)
+        return therapist, username, password
+    
+    def allocate_ids(self, prefix, count=1):
+        """Резервирует count номеров из счетчика prefix; номера не повторяются и после удаления пользователей.
+        
+        UPDATE берет блокировку записи, поэтому параллельные вызовы получают разные номера.
+        Внутри внешней транзакции номера возвращаются в счетчик при ее откате.
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE id_sequences SET next_value = next_value + ? WHERE prefix = ?', (count, prefix))
+            cursor.execute('SELECT next_value FROM id_sequences WHERE prefix = ?', (prefix,))
+            end = cursor.fetchone()[0]
+        return list(range(end - count, end))
+    
+    def get_next_patient_id(self):
+        return self.allocate_ids('PT')[0]
+    
+    def get_next_therapist_id(self):
+        return self.allocate_ids('TH')[0]
+    
+    def verify_password(self, user, password):
+        """Проверка пароля в пуле хэширования; устаревший хэш заменяется после успешного входа.
+        
+        HasherBusy при переполненной очереди пробрасывается вызывающему.
+        """
+        if not self.hasher.verify(password, user.password_hash):
+            return False
+        if self.hasher.needs_rehash(user.password_hash):
+            self._rehash(user, password)
+        return True
+    
+    def _rehash(self, user, password):
+        try:
+            new_password_hash = self.hasher.hash(password)
+        except (HasherBusy, FuturesTimeout):
+            return  # пересчитаем при следующем входе
+        
+        with self.db.connection() as conn:
+            # Условие на старый хэш: не затираем пароль, смененный параллельно
+            conn.execute('UPDATE users SET password_hash = ? WHERE user_id = ? AND password_hash = ?',
+                         (new_password_hash, user.user_id, user.password_hash))
\ No newline at end of file
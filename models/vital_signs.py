@@ -0,0 +1,146 @@
+import json
+import random
+import threading
+import time
+
+# Частота выдачи показателей в потоке и интервал heartbeat без активной сессии, секунд
+STREAM_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+# Одновременных потоков на одну сессию (вкладки терапевта)
+MAX_STREAMS_PER_SESSION = 3
+
+def generate_vital_signs(sud_value):
+    """Симуляция показателей датчиков на основе текущего SUD"""
+    base_hr = 70 + (sud_value * 3)  # пульс увеличивается с SUD
+    hr_variation = random.randint(-5, 5)
+    
+    base_sys = 120 + (sud_value * 2)  # систолическое давление
+    base_dia = 80 + (sud_value * 1)   # диастолическое давление
+    
+    return {
+        'heart_rate': max(60, base_hr + hr_variation),
+        'blood_pressure': f"{base_sys}/{base_dia}",
+        'temperature': round(36.6 + random.uniform(-0.2, 0.2), 1),
+        'stress_level': sud_value,
+        'respiration_rate': 16 + sud_value,
+        'skin_conductance': round(2 + (sud_value * 0.3), 1),
+        'oxygen_saturation': 98 - (sud_value * 0.5),
+        'timestamp': int(time.time() * 1000)
+    }
+
+class VitalSignsHub:
+    """Состояние активных сессий (SUD, фаза) для потоков показателей.
+    
+    Ключ - (therapist_id, patient_id). Поток хранит только последнее состояние,
+    поэтому медленный клиент не накапливает очередь: он получает актуальные данные.
+    Число одновременных потоков на ключ ограничено MAX_STREAMS_PER_SESSION.
+    """
+    
+    def __init__(self, store=None):
+        # store - VitalsStore для записи показаний сессии (None - не сохранять)
+        self.store = store
+        self._states = {}
+        self._readings = {}
+        self._streams = {}
+        self._condition = threading.Condition()
+    
+    def publish(self, key, sud_value, phase, session_id=None):
+        with self._condition:
+            previous = self._states.get(key)
+            self._states[key] = {
+                'sud_value': sud_value,
+                'phase': phase,
+                'session_id': session_id or (previous and previous['session_id']),
+                'revision': previous['revision'] + 1 if previous else 1
+            }
+            self._condition.notify_all()
+    
+    def current_reading(self, key):
+        """Показание сессии: новое - при смене состояния или раз в STREAM_INTERVAL, общее для всех потоков"""
+        with self._condition:
+            state = self._states.get(key)
+            if state is None:
+                return None
+            
+            now = time.monotonic()
+            cached = self._readings.get(key)
+            # Небольшой допуск, чтобы поток с периодом STREAM_INTERVAL не пропускал генерацию
+            if cached and cached[0] == state['revision'] and now - cached[1] < STREAM_INTERVAL * 0.9:
+                return cached[2]
+            
+            reading = generate_vital_signs(state['sud_value'])
+            reading['phase'] = state['phase']
+            self._readings[key] = (state['revision'], now, reading)
+            session_id = state['session_id']
+        
+        if self.store is not None and session_id:
+            self.store.append(session_id, key[1], reading)
+        return reading
+    
+    def get(self, key):
+        with self._condition:
+            state = self._states.get(key)
+            return dict(state) if state else None
+    
+    def discard(self, key):
+        with self._condition:
+            state = self._states.pop(key, None)
+            self._readings.pop(key, None)
+            self._condition.notify_all()
+        
+        if self.store is not None and state and state['session_id']:
+            self.store.close(state['session_id'])
+    
+    def open_stream(self, key):
+        """Генератор событий для key или None, если лимит потоков сессии исчерпан"""
+        with self._condition:
+            if self._streams.get(key, 0) >= MAX_STREAMS_PER_SESSION:
+                return None
+        return self._stream(key)
+    
+    def _count_stream(self, key, delta):
+        # Учет ведется внутри генератора: поток, который так и не начали читать, не занимает слот
+        with self._condition:
+            self._streams[key] = self._streams.get(key, 0) + delta
+            if not self._streams[key]:
+                del self._streams[key]
+    
+    def wait(self, key, revision, timeout):
+        """Ждет изменения состояния (или таймаута). Возвращает текущее состояние"""
+        def changed():
+            state = self._states.get(key)
+            return (state['revision'] if state else None) != revision
+        
+        with self._condition:
+            self._condition.wait_for(changed, timeout)
+            state = self._states.get(key)
+            return dict(state) if state else None
+    
+    def _stream(self, key):
+        """События Server-Sent Events: показатели раз в STREAM_INTERVAL и сразу при смене SUD"""
+        self._count_stream(key, 1)
+        try:
+            yield 'retry: 2000\n\n'
+            revision = None
+            was_active = False
+            last_event = time.monotonic()
+            while True:
+                state = self.wait(key, revision, STREAM_INTERVAL if was_active else HEARTBEAT_INTERVAL)
+                
+                if state is None:
+                    if was_active:
+                        yield 'event: end\ndata: {}\n\n'
+                        return
+                    if time.monotonic() - last_event >= HEARTBEAT_INTERVAL:
+                        yield ': heartbeat\n\n'
+                        last_event = time.monotonic()
+                    continue
+                
+                was_active = True
+                revision = state['revision']
+                vital_signs = self.current_reading(key)
+                if vital_signs is not None:
+                    yield f'data: {json.dumps(vital_signs)}\n\n'
+                last_event = time.monotonic()
+        finally:
+            self._count_stream(key, -1)
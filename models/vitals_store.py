@@ -0,0 +1,170 @@
+"""Хранилище временных рядов показателей жизнедеятельности по сессиям.
+
+Показания копятся в памяти в поколоночных буферах array и сбрасываются
+в таблицу vital_chunks пачками: одна строка на FLUSH_SAMPLES показаний,
+колонки - упакованные float32, сжатые zlib. Час записи с частотой 1 Гц
+занимает десятки килобайт вместо мегабайт JSON.
+"""
+import threading
+import time
+import zlib
+from array import array
+
+# Колонки ряда (float32); давление разбирается на систолическое и диастолическое
+VITAL_COLUMNS = ('heart_rate', 'systolic', 'diastolic', 'temperature', 'stress_level',
+                 'respiration_rate', 'skin_conductance', 'oxygen_saturation')
+# Показаний в одной строке vital_chunks
+FLUSH_SAMPLES = 300
+
+def _split_reading(vital_signs):
+    values = dict(vital_signs)
+    systolic, _, diastolic = str(values.get('blood_pressure', '')).partition('/')
+    values['systolic'] = float(systolic) if systolic else 0.0
+    values['diastolic'] = float(diastolic) if diastolic else 0.0
+    return [float(values.get(column) or 0) for column in VITAL_COLUMNS]
+
+class _SeriesBuffer:
+    """Несброшенные показания одной сессии"""
+    
+    def __init__(self, patient_id):
+        self.patient_id = patient_id
+        self.timestamps = array('q')
+        self.columns = [array('f') for _ in VITAL_COLUMNS]
+    
+    def append(self, timestamp, values):
+        self.timestamps.append(timestamp)
+        for column, value in zip(self.columns, values):
+            column.append(value)
+    
+    def __len__(self):
+        return len(self.timestamps)
+    
+    def pack(self):
+        """Кортеж для вставки в vital_chunks"""
+        start_ts = self.timestamps[0]
+        offsets = array('I', (timestamp - start_ts for timestamp in self.timestamps))
+        values = b''.join(column.tobytes() for column in self.columns)
+        return (start_ts, self.timestamps[-1], len(self),
+                zlib.compress(offsets.tobytes()), zlib.compress(values))
+
+def _unpack(start_ts, sample_count, offsets_blob, values_blob):
+    offsets = array('I')
+    offsets.frombytes(zlib.decompress(offsets_blob))
+    values = array('f')
+    values.frombytes(zlib.decompress(values_blob))
+    timestamps = [start_ts + offset for offset in offsets]
+    columns = [values[i * sample_count:(i + 1) * sample_count] for i in range(len(VITAL_COLUMNS))]
+    return timestamps, columns
+
+class VitalsStore:
+    def __init__(self, db, flush_samples=FLUSH_SAMPLES):
+        self.db = db
+        self.flush_samples = flush_samples
+        self._buffers = {}
+        self._lock = threading.Lock()
+    
+    def append(self, session_id, patient_id, vital_signs):
+        """Добавляет показание; при заполнении буфера сбрасывает его в БД"""
+        timestamp = int(vital_signs.get('timestamp') or time.time() * 1000)
+        with self._lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is None:
+                buffer = self._buffers[session_id] = _SeriesBuffer(patient_id)
+            buffer.append(timestamp, _split_reading(vital_signs))
+            if len(buffer) < self.flush_samples:
+                return
+            del self._buffers[session_id]
+        self._write(session_id, buffer)
+    
+    def close(self, session_id):
+        """Сбрасывает остаток показаний завершенной сессии"""
+        with self._lock:
+            buffer = self._buffers.pop(session_id, None)
+        if buffer:
+            self._write(session_id, buffer)
+    
+    def flush_all(self):
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+        for session_id, buffer in buffers.items():
+            self._write(session_id, buffer)
+    
+    def _write(self, session_id, buffer):
+        with self.db.connection() as conn:
+            conn.execute('''
+                INSERT INTO vital_chunks
+                (session_id, patient_id, start_ts, end_ts, sample_count, timestamps, vital_values)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (session_id, buffer.patient_id) + buffer.pack())
+    
+    def get_patient_id(self, session_id):
+        with self._lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is not None:
+                return buffer.patient_id
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT patient_id FROM vital_chunks WHERE session_id = ? LIMIT 1',
+                               (session_id,)).fetchone()
+        return row[0] if row else None
+    
+    def _load(self, session_id, start_ts, end_ts):
+        """Показания сессии в диапазоне [start_ts, end_ts]: (timestamps, [колонки])"""
+        with self.db.connection() as conn:
+            rows = conn.execute('''
+                SELECT start_ts, sample_count, timestamps, vital_values FROM vital_chunks
+                WHERE session_id = ? AND end_ts >= ? AND start_ts <= ?
+                ORDER BY start_ts
+            ''', (session_id, start_ts, end_ts)).fetchall()
+        
+        chunks = [_unpack(*row) for row in rows]
+        with self._lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is not None:
+                chunks.append((list(buffer.timestamps), [array('f', column) for column in buffer.columns]))
+        
+        timestamps = []
+        columns = [[] for _ in VITAL_COLUMNS]
+        for chunk_timestamps, chunk_columns in chunks:
+            for i, timestamp in enumerate(chunk_timestamps):
+                if start_ts <= timestamp <= end_ts:
+                    timestamps.append(timestamp)
+                    for column, chunk_column in zip(columns, chunk_columns):
+                        column.append(chunk_column[i])
+        return timestamps, columns
+    
+    def query(self, session_id, start_ts=None, end_ts=None, points=200):
+        """Ряд сессии, прореженный до points равных по времени интервалов с min/max/avg.
+        
+        Возвращает {'timestamps': [...], 'sample_counts': [...], колонка: {'min', 'max', 'avg'}}.
+        """
+        start_ts = 0 if start_ts is None else start_ts
+        end_ts = 2 ** 62 if end_ts is None else end_ts
+        timestamps, columns = self._load(session_id, start_ts, end_ts)
+        
+        result = {'timestamps': [], 'sample_counts': []}
+        for name in VITAL_COLUMNS:
+            result[name] = {'min': [], 'max': [], 'avg': []}
+        if not timestamps:
+            return result
+        
+        first, last = timestamps[0], timestamps[-1]
+        bucket_ms = max((last - first + 1) / max(points, 1), 1)
+        
+        bucket_start = 0
+        while bucket_start < len(timestamps):
+            bucket_index = int((timestamps[bucket_start] - first) // bucket_ms)
+            bucket_end = bucket_start
+            while (bucket_end < len(timestamps)
+                   and int((timestamps[bucket_end] - first) // bucket_ms) == bucket_index):
+                bucket_end += 1
+            
+            result['timestamps'].append(int(first + bucket_index * bucket_ms))
+            result['sample_counts'].append(bucket_end - bucket_start)
+            for name, column in zip(VITAL_COLUMNS, columns):
+                values = column[bucket_start:bucket_end]
+                result[name]['min'].append(round(min(values), 2))
+                result[name]['max'].append(round(max(values), 2))
+                result[name]['avg'].append(round(sum(values) / len(values), 2))
+            bucket_start = bucket_end
+        
+        return result
@@ -0,0 +1,176 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+INSERT_SUD_EVENT = '''
+    INSERT INTO sud_events (session_id, patient_id, phase, sud_value, source, recorded_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+class WriteBehindQueue:
+    """Фоновая запись событий SUD и завершенных сессий.
+    
+    Обработчик запроса только ставит запись в очередь; фоновый поток сбрасывает
+    накопленное одной транзакцией (group commit) раз в batch_interval секунд.
+    Пачка с некорректной строкой (любая ошибка sqlite3, кроме OperationalError)
+    дописывается построчно, плохие строки отбрасываются в лог; при OperationalError (например, БД занята) пачка
+    возвращается в очередь, но не более max_retries раз подряд. Частые обновления ползунка SUD схлопываются: из серии для одной сессии и
+    фазы в БД попадает последнее значение. При переполнении очереди
+    (max_pending) запись блокируется до сброса - это ограничивает память.
+    """
+    
+    def __init__(self, db, session_writer, batch_interval=0.2, max_pending=10000, max_retries=5):
+        self.db = db
+        # Функция записи строк therapy_sessions (TherapyDataManager.add_sessions)
+        self.session_writer = session_writer
+        self.batch_interval = batch_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        
+        self._coalesced = {}   # (session_id, phase) -> событие SUD
+        self._events = []      # события SUD без схлопывания
+        self._sessions = []    # завершенные сессии
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._in_flight = False
+        self._failures = 0     # неудачных попыток записи подряд
+    
+    def record_sud(self, session_id, patient_id, phase, sud_value, source, coalesce=False):
+        event = (session_id, patient_id, phase, sud_value, source, datetime.now().isoformat())
+        with self._condition:
+            self._wait_for_room()
+            if coalesce:
+                self._coalesced[(session_id, phase)] = event
+            else:
+                self._events.append(event)
+            self._notify()
+    
+    def record_session(self, session):
+        """Ставит в очередь завершенную сессию (models.therapy_models.Session)"""
+        with self._condition:
+            self._wait_for_room()
+            self._sessions.append(session)
+            self._notify()
+    
+    def flush(self, timeout=None):
+        """Ждет, пока все поставленные записи окажутся в БД"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._condition.notify_all()
+            while self._pending_count() or self._in_flight:
+                if self._thread is None or not self._thread.is_alive():
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        # Поток не запущен или остановлен - дописываем остаток сами
+        self._write_batch()
+        return True
+    
+    def close(self):
+        """Сбрасывает очередь и останавливает фоновый поток (чистое завершение процесса)"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _pending_count(self):
+        return len(self._coalesced) + len(self._events) + len(self._sessions)
+    
+    def _wait_for_room(self):
+        while self._pending_count() >= self.max_pending and self._thread and self._thread.is_alive():
+            self._condition.wait()
+    
+    def _notify(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        self._condition.notify_all()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending_count() and not self._closed:
+                    self._condition.wait()
+                if self._closed and not self._pending_count():
+                    return
+            # Даем накопиться пачке, затем пишем ее одной транзакцией
+            time.sleep(self.batch_interval)
+            try:
+                self._write_batch()
+            except Exception:
+                # При OperationalError пачка возвращена в очередь и будет повторена,
+                # прочие ошибки ее отбрасывают - поток записи при этом не останавливается
+                logger.exception('Ошибка фоновой записи (неудач подряд: %d)', self._failures)
+    
+    def _write_batch(self):
+        with self._condition:
+            events = self._events + list(self._coalesced.values())
+            sessions = self._sessions
+            self._events, self._coalesced, self._sessions = [], {}, []
+            self._in_flight = bool(events or sessions)
+            self._condition.notify_all()
+        if not (events or sessions):
+            return
+        
+        requeue = False
+        try:
+            try:
+                self._write(events, sessions)
+            except sqlite3.OperationalError:
+                raise
+            except sqlite3.Error:
+                # Повтор не исправит данные: пишем построчно, отбрасывая плохие строки
+                self._write_rows(events, sessions)
+            self._failures = 0
+        except sqlite3.OperationalError:
+            self._failures += 1
+            if self._failures <= self.max_retries:
+                requeue = True
+                raise
+            logger.exception('Фоновая запись не удалась %d раз подряд, отброшено событий SUD: %d, сессий: %d',
+                             self._failures, len(events), len(sessions))
+            self._failures = 0
+        finally:
+            with self._condition:
+                if requeue:
+                    self._events[:0] = events
+                    self._sessions[:0] = sessions
+                self._in_flight = False
+                self._condition.notify_all()
+    
+    def _write(self, events, sessions):
+        with self.db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if events:
+                conn.executemany(INSERT_SUD_EVENT, events)
+            if sessions:
+                self.session_writer(sessions)
+    
+    def _write_rows(self, events, sessions):
+        """Пишет пачку одной транзакцией, но каждую строку отдельной командой:
+        ошибка в данных откатывает только свою строку"""
+        with self.db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for event in events:
+                try:
+                    conn.execute(INSERT_SUD_EVENT, event)
+                except sqlite3.OperationalError:
+                    raise
+                except sqlite3.Error as e:
+                    logger.error('Отброшено событие SUD %r: %s', event, e)
+            for session in sessions:
+                try:
+                    self.session_writer([session])
+                except sqlite3.OperationalError:
+                    raise
+                except sqlite3.Error as e:
+                    logger.error('Отброшена сессия %s: %s', session.session_id, e)
\ No newline at end of file
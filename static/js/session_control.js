@@ -0,0 +1,818 @@
+class SessionSimulation {
+    constructor(patientId) {
+        this.patientId = patientId;
+        this.currentScenario = null;
+        this.isSimulationActive = false;
+        this.currentPhase = null;
+        this.scenarios = [];
+        this.isEditMode = false;
+        this.previousVitalSigns = {};
+        this.sessionTimer = null;
+        this.sessionStartTime = null;
+        this.sessionDuration = 3 * 60 * 1000; // 3 минуты в миллисекундах
+        this.sudCheckpoints = [15, 90, 180]; // секунды для оценки SUD
+        this.currentCheckpointIndex = 0;
+        this.vitalSignsInterval = null;
+        
+        this.initializeEventListeners();
+        this.loadScenarios();
+        this.initializeChatTime();
+    }
+
+    initializeEventListeners() {
+        // Кнопка редактирования layout
+        document.getElementById('editLayoutBtn').addEventListener('click', () => {
+            this.toggleEditMode();
+        });
+
+        // Экстренная остановка
+        document.getElementById('emergencyStop').addEventListener('click', () => {
+            this.emergencyStop();
+        });
+
+        // Кнопки SUD в модальном окне
+        document.querySelectorAll('.sud-btn-modal').forEach(btn => {
+            btn.addEventListener('click', (e) => {
+                const value = parseInt(e.currentTarget.dataset.value);
+                this.submitSUD(value);
+            });
+        });
+
+        // Инструменты
+        document.getElementById('toolIntensity').addEventListener('click', () => {
+            this.toggleToolControl('intensityControl');
+        });
+
+        document.getElementById('toolEnvironment').addEventListener('click', () => {
+            this.toggleToolControl('environmentControl');
+        });
+
+        // Слайдер интенсивности
+        document.getElementById('intensitySlider').addEventListener('input', (e) => {
+            this.updateIntensity(parseInt(e.target.value));
+        });
+
+        // Кнопки среды
+        document.querySelectorAll('.env-btn').forEach(btn => {
+            btn.addEventListener('click', (e) => {
+                this.selectEnvironment(e.target.dataset.environment);
+            });
+        });
+
+        // Чат
+        document.getElementById('sendMessage').addEventListener('click', () => {
+            this.sendMessage();
+        });
+
+        document.getElementById('chatInput').addEventListener('keypress', (e) => {
+            if (e.key === 'Enter') {
+                this.sendMessage();
+            }
+        });
+    }
+
+    initializeChatTime() {
+        const now = new Date();
+        const timeString = now.getHours().toString().padStart(2, '0') + ':' + 
+                          now.getMinutes().toString().padStart(2, '0');
+        document.getElementById('initialMessageTime').textContent = timeString;
+    }
+
+    async loadScenarios() {
+        try {
+            const response = await fetch('/api/session/scenarios');
+            this.scenarios = await response.json();
+            this.renderScenarios();
+        } catch (error) {
+            console.error('Ошибка загрузки сценариев:', error);
+            this.showMessage('Ошибка загрузки сценариев', 'error');
+        }
+    }
+
+    renderScenarios() {
+        const container = document.getElementById('scenariosList');
+        container.innerHTML = '';
+        
+        this.scenarios.forEach(scenario => {
+            const scenarioElement = document.createElement('div');
+            scenarioElement.className = 'scenario-item';
+            scenarioElement.innerHTML = `
+                <div class="scenario-name">${scenario.name}</div>
+                <div class="scenario-description">${scenario.description}</div>
+                <div class="scenario-profile">${scenario.patient_profile}</div>
+                <div class="scenario-sud">Начальный SUD: ${scenario.initial_sud}</div>
+            `;
+            
+            scenarioElement.addEventListener('click', () => {
+                this.selectScenario(scenario);
+            });
+            
+            container.appendChild(scenarioElement);
+        });
+    }
+
+    async selectScenario(scenario) {
+        document.querySelectorAll('.scenario-item').forEach(item => {
+            item.classList.remove('selected');
+        });
+        
+        event.target.closest('.scenario-item').classList.add('selected');
+        
+        this.currentScenario = scenario;
+        
+        try {
+            const response = await fetch('/api/session/start_scenario', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    scenario_id: scenario.id,
+                    patient_id: this.patientId
+                })
+            });
+
+            const data = await response.json();
+            
+            if (data.success) {
+                this.isSimulationActive = true;
+                this.showSimulationControls();
+                this.updateVRScene(scenario.environment);
+                this.updateSessionStatus('active');
+                this.addChatMessage('system', `Симуляция запущена: ${scenario.name}`);
+                this.addChatMessage('system', `Пациент: ${scenario.patient_profile}`);
+                
+                // Запускаем сессию
+                this.startSession();
+                this.showMessage('Симуляция успешно запущена', 'success');
+            }
+        } catch (error) {
+            console.error('Ошибка запуска сценария:', error);
+            this.showMessage('Ошибка запуска сценария', 'error');
+        }
+    }
+
+    showSimulationControls() {
+        document.getElementById('simulationControls').style.display = 'block';
+        
+        // Активируем чат
+        document.getElementById('chatInput').disabled = false;
+        document.getElementById('sendMessage').disabled = false;
+    }
+
+    updateVRScene(environment) {
+        document.getElementById('scenePlaceholder').style.display = 'none';
+        document.getElementById('sceneActive').style.display = 'block';
+        
+        const sceneView = document.getElementById('sceneView');
+        sceneView.className = 'scene-view';
+        
+        let sceneHTML = '';
+        
+        switch(environment) {
+            case 'safe_place':
+                sceneView.classList.add('environment-beach');
+                sceneHTML = `
+                    <div class="beach-sky"></div>
+                    <div class="beach-ocean"></div>
+                    <div class="beach-sand"></div>
+                    <div class="beach-palm">
+                        <div class="palm-trunk"></div>
+                        <div class="palm-leaves"></div>
+                    </div>
+                `;
+                break;
+            case 'exposure_city':
+                sceneView.classList.add('environment-city');
+                sceneHTML = `
+                    <div class="city-buildings">
+                        <div class="building windowed" style="height: 70%;"></div>
+                        <div class="building windowed" style="height: 85%;"></div>
+                        <div class="building windowed" style="height: 60%;"></div>
+                        <div class="building windowed" style="height: 75%;"></div>
+                        <div class="building windowed" style="height: 65%;"></div>
+                    </div>
+                `;
+                break;
+            case 'exposure_nature':
+                sceneView.classList.add('environment-nature');
+                sceneHTML = `
+                    <div class="nature-mountains">
+                        <div class="mountain"></div>
+                        <div class="mountain"></div>
+                        <div class="mountain"></div>
+                    </div>
+                    <div class="nature-trees">
+                        <div class="tree">
+                            <div class="tree-trunk"></div>
+                            <div class="tree-top"></div>
+                        </div>
+                        <div class="tree">
+                            <div class="tree-trunk"></div>
+                            <div class="tree-top"></div>
+                        </div>
+                        <div class="tree">
+                            <div class="tree-trunk"></div>
+                            <div class="tree-top"></div>
+                        </div>
+                    </div>
+                `;
+                break;
+        }
+        
+        sceneView.innerHTML = sceneHTML;
+    }
+
+    startSession() {
+        this.sessionStartTime = Date.now();
+        this.currentCheckpointIndex = 0;
+        
+        // Запускаем таймер сессии
+        this.sessionTimer = setInterval(() => {
+            this.updateSessionTimer();
+        }, 1000);
+        
+        // Запускаем мониторинг показателей
+        this.startVitalSignsMonitoring();
+        
+        // Начальная оценка SUD через 15 секунд
+        setTimeout(() => {
+            this.showSUDPrompt('pre', 'Начальная оценка');
+        }, 15000);
+        
+        // Промежуточная оценка через 90 секунд
+        setTimeout(() => {
+            if (this.isSimulationActive) {
+                this.showSUDPrompt('during', 'Промежуточная оценка');
+            }
+        }, 90000);
+        
+        // Финальная оценка через 180 секунд
+        setTimeout(() => {
+            if (this.isSimulationActive) {
+                this.showSUDPrompt('post', 'Финальная оценка');
+            }
+        }, 180000);
+    }
+
+    updateSessionTimer() {
+        if (!this.sessionStartTime) return;
+        
+        const elapsed = Date.now() - this.sessionStartTime;
+        const remaining = Math.max(0, this.sessionDuration - elapsed);
+        
+        const minutes = Math.floor(remaining / 60000);
+        const seconds = Math.floor((remaining % 60000) / 1000);
+        
+        // Обновляем таймер
+        document.getElementById('sessionTimer').textContent = 
+            `${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
+        
+        // Обновляем прогресс-бар
+        const progress = (elapsed / this.sessionDuration) * 100;
+        document.getElementById('progressFill').style.width = `${Math.min(progress, 100)}%`;
+        
+        // Обновляем время прогресса
+        const elapsedMinutes = Math.floor(elapsed / 60000);
+        const elapsedSeconds = Math.floor((elapsed % 60000) / 1000);
+        document.getElementById('progressTime').textContent = 
+            `${elapsedMinutes}:${elapsedSeconds.toString().padStart(2, '0')} / 3:00`;
+        
+        // Завершение сессии по таймеру
+        if (remaining <= 0) {
+            this.completeSession();
+        }
+    }
+
+    showSUDPrompt(phase, phaseName) {
+        if (!this.isSimulationActive) return;
+        
+        const modal = document.getElementById('sudModal');
+        const phaseElement = document.getElementById('sudModalPhase');
+        
+        // Устанавливаем ожидаемое значение SUD по сценарию
+        let expectedSud;
+        switch(phase) {
+            case 'pre':
+                expectedSud = this.currentScenario.initial_sud;
+                break;
+            case 'during':
+                expectedSud = this.currentScenario.expected_progress[0];
+                break;
+            case 'post':
+                expectedSud = this.currentScenario.expected_progress[2];
+                break;
+        }
+        
+        phaseElement.textContent = phaseName;
+        modal.style.display = 'flex';
+        
+        // Автоматически "выбираем" ожидаемое значение через 2 секунды
+        setTimeout(() => {
+            if (modal.style.display !== 'none') {
+                this.autoSelectSUD(expectedSud, phase);
+            }
+        }, 2000);
+    }
+
+    autoSelectSUD(sudValue, phase) {
+        // Визуально выделяем кнопку
+        document.querySelectorAll('.sud-btn-modal').forEach(btn => {
+            btn.classList.remove('selected');
+            if (parseInt(btn.dataset.value) === sudValue) {
+                btn.classList.add('selected');
+            }
+        });
+        
+        // Через еще 1 секунду отправляем оценку
+        setTimeout(() => {
+            this.submitSUD(sudValue, phase);
+        }, 1000);
+    }
+
+    async submitSUD(sudValue, phase = null) {
+        if (!phase) {
+            phase = this.currentCheckpointIndex === 0 ? 'pre' : 
+                   this.currentCheckpointIndex === 2 ? 'post' : 'during';
+        }
+        
+        try {
+            const response = await fetch('/api/session/submit_sud', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    patient_id: this.patientId,
+                    sud_value: sudValue,
+                    phase: phase
+                })
+            });
+
+            const data = await response.json();
+            
+            if (data.success) {
+                // Скрываем модальное окно
+                document.getElementById('sudModal').style.display = 'none';
+                
+                // Обновляем интерфейс
+                this.updateSUDDisplay(sudValue);
+                this.showPatientReaction(data.patient_reaction);
+                
+                this.addChatMessage('patient', data.patient_reaction);
+                this.addChatMessage('system', `SUD оценка: ${sudValue} (${this.getPhaseName(phase)})`);
+                
+                this.currentCheckpointIndex++;
+                
+                this.showMessage(`SUD оценка принята: ${sudValue}`, 'success');
+                
+                // Обновляем фазу в интерфейсе
+                document.getElementById('currentPhase').textContent = this.getPhaseName(phase);
+                document.getElementById('patientSud').textContent = sudValue;
+                document.getElementById('patientReactionText').textContent = data.patient_reaction;
+            }
+        } catch (error) {
+            console.error('Ошибка отправки SUD:', error);
+            this.showMessage('Ошибка отправки оценки', 'error');
+        }
+    }
+
+    startVitalSignsMonitoring() {
+        // Поток показателей с сервера (Server-Sent Events)
+        if (window.EventSource) {
+            this.vitalSignsStream = new EventSource(`/api/session/vital_signs/${this.patientId}/stream`);
+            this.vitalSignsStream.onmessage = (event) => {
+                if (this.isSimulationActive) {
+                    this.displayVitalSigns(JSON.parse(event.data));
+                }
+            };
+            this.vitalSignsStream.addEventListener('end', () => this.stopVitalSignsMonitoring());
+            return;
+        }
+        
+        // Запасной вариант для браузеров без EventSource: опрос каждые 3 секунды
+        this.updateVitalSigns();
+        this.vitalSignsInterval = setInterval(() => {
+            this.updateVitalSigns();
+        }, 3000);
+    }
+
+    stopVitalSignsMonitoring() {
+        if (this.vitalSignsStream) {
+            this.vitalSignsStream.close();
+            this.vitalSignsStream = null;
+        }
+        
+        if (this.vitalSignsInterval) {
+            clearInterval(this.vitalSignsInterval);
+            this.vitalSignsInterval = null;
+        }
+    }
+
+    async updateVitalSigns() {
+        if (!this.isSimulationActive) return;
+        
+        try {
+            const response = await fetch(`/api/session/vital_signs/${this.patientId}`);
+            const data = await response.json();
+            
+            if (data.success) {
+                this.displayVitalSigns(data.vital_signs);
+            }
+        } catch (error) {
+            console.error('Ошибка обновления показателей:', error);
+        }
+    }
+
+    displayVitalSigns(signs) {
+        // Сохраняем предыдущие значения для сравнения
+        const previous = { ...this.previousVitalSigns };
+        this.previousVitalSigns = { ...signs };
+
+        // Обновляем значения с анимацией
+        this.updateVitalValue('vitalHeartRate', signs.heart_rate, previous.heart_rate);
+        this.updateVitalValue('vitalBloodPressure', signs.blood_pressure, previous.blood_pressure);
+        this.updateVitalValue('vitalTemperature', signs.temperature + '°C', previous.temperature);
+        this.updateVitalValue('vitalStress', signs.stress_level, previous.stress_level);
+        this.updateVitalValue('vitalRespiration', signs.respiration_rate, previous.respiration_rate);
+        this.updateVitalValue('vitalConductance', signs.skin_conductance.toFixed(1), previous.skin_conductance);
+
+        // Обновляем тренды
+        this.updateVitalTrend('heartRate', signs.heart_rate, previous.heart_rate);
+        this.updateVitalTrend('stress', signs.stress_level, previous.stress_level);
+        this.updateVitalTrend('respiration', signs.respiration_rate, previous.respiration_rate);
+    }
+
+    updateVitalValue(elementId, newValue, oldValue) {
+        const element = document.getElementById(elementId);
+        if (!element) return;
+        
+        if (element.textContent !== newValue.toString()) {
+            element.textContent = newValue;
+            element.classList.add('value-changing');
+            setTimeout(() => element.classList.remove('value-changing'), 600);
+        }
+    }
+
+    updateVitalTrend(type, current, previous) {
+        if (previous === undefined) return;
+        
+        const trendElement = document.getElementById(type + 'Trend');
+        if (!trendElement) return;
+        
+        const diff = current - previous;
+        let trendClass = 'stable';
+        let trendIcon = '=';
+
+        if (Math.abs(diff) > 0.1) {
+            if (diff > 0) {
+                trendClass = 'up';
+                trendIcon = '↑';
+            } else {
+                trendClass = 'down';
+                trendIcon = '↓';
+            }
+        }
+
+        trendElement.className = 'vital-trend ' + trendClass;
+        trendElement.textContent = trendIcon + (diff !== 0 ? Math.abs(diff).toFixed(1) : '');
+    }
+
+    updateSUDDisplay(sudValue) {
+        document.getElementById('currentSudDisplay').textContent = sudValue;
+        document.getElementById('patientSud').textContent = sudValue;
+        document.getElementById('vitalStress').textContent = sudValue;
+        
+        const sudDisplay = document.getElementById('currentSudDisplay');
+        sudDisplay.className = 'sud-value';
+        
+        if (sudValue >= 7) {
+            sudDisplay.classList.add('sud-high');
+        } else if (sudValue >= 4) {
+            sudDisplay.classList.add('sud-medium');
+        } else {
+            sudDisplay.classList.add('sud-low');
+        }
+    }
+
+    showPatientReaction(reaction) {
+        const reactionElement = document.getElementById('patientReaction');
+        reactionElement.textContent = `"${reaction}"`;
+        
+        reactionElement.style.opacity = '0';
+        reactionElement.style.transform = 'translateY(10px)';
+        
+        setTimeout(() => {
+            reactionElement.style.opacity = '1';
+            reactionElement.style.transform = 'translateY(0)';
+            reactionElement.style.transition = 'all 0.3s ease';
+        }, 100);
+    }
+
+    updateSessionStatus(status) {
+        const statusElement = document.getElementById('sessionStatus');
+        statusElement.innerHTML = '';
+        
+        let statusHTML = '';
+        switch(status) {
+            case 'active':
+                statusHTML = '<i class="fas fa-circle status-active"></i> Сессия активна';
+                break;
+            case 'inactive':
+                statusHTML = '<i class="fas fa-circle status-inactive"></i> Не активно';
+                break;
+            case 'paused':
+                statusHTML = '<i class="fas fa-circle status-warning"></i> На паузе';
+                break;
+        }
+        
+        statusElement.innerHTML = statusHTML;
+    }
+
+    addChatMessage(type, content) {
+        const messagesContainer = document.getElementById('chatMessages');
+        const messageElement = document.createElement('div');
+        messageElement.className = `message ${type}`;
+        
+        const now = new Date();
+        const timeString = now.getHours().toString().padStart(2, '0') + ':' + 
+                          now.getMinutes().toString().padStart(2, '0');
+        
+        messageElement.innerHTML = `
+            <div class="message-content">${content}</div>
+            <div class="message-time">${timeString}</div>
+        `;
+        
+        messagesContainer.appendChild(messageElement);
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+
+    toggleEditMode() {
+        this.isEditMode = !this.isEditMode;
+        const layout = document.getElementById('dashboardLayout');
+        const editBtn = document.getElementById('editLayoutBtn');
+        
+        if (this.isEditMode) {
+            layout.classList.add('edit-mode');
+            editBtn.innerHTML = '<i class="fas fa-check"></i> Завершить редактирование';
+            editBtn.classList.add('btn-primary');
+            this.initializeDragAndDrop();
+        } else {
+            layout.classList.remove('edit-mode');
+            editBtn.innerHTML = '<i class="fas fa-edit"></i> Редактировать layout';
+            editBtn.classList.remove('btn-primary');
+            this.destroyDragAndDrop();
+        }
+    }
+
+    initializeDragAndDrop() {
+        const widgets = document.querySelectorAll('.widget:not(.vr-scene-widget)');
+        
+        widgets.forEach(widget => {
+            widget.setAttribute('draggable', 'true');
+            
+            widget.addEventListener('dragstart', (e) => {
+                if (!this.isEditMode) {
+                    e.preventDefault();
+                    return;
+                }
+                e.dataTransfer.setData('text/plain', widget.dataset.widgetId);
+                widget.classList.add('dragging');
+                setTimeout(() => widget.style.display = 'none', 0);
+            });
+            
+            widget.addEventListener('dragend', () => {
+                if (!this.isEditMode) return;
+                widget.classList.remove('dragging');
+                widget.style.display = 'flex';
+            });
+        });
+
+        const layout = document.getElementById('dashboardLayout');
+        
+        layout.addEventListener('dragover', (e) => {
+            if (!this.isEditMode) return;
+            e.preventDefault();
+            const afterElement = this.getDragAfterElement(layout, e.clientY);
+            const draggable = document.querySelector('.dragging');
+            
+            if (afterElement) {
+                layout.insertBefore(draggable, afterElement);
+            } else {
+                layout.appendChild(draggable);
+            }
+        });
+    }
+
+    destroyDragAndDrop() {
+        const widgets = document.querySelectorAll('.widget');
+        widgets.forEach(widget => {
+            widget.removeAttribute('draggable');
+            widget.classList.remove('dragging');
+        });
+    }
+
+    getDragAfterElement(container, y) {
+        const draggableElements = [...container.querySelectorAll('.widget:not(.dragging):not(.vr-scene-widget)')];
+        
+        return draggableElements.reduce((closest, child) => {
+            const box = child.getBoundingClientRect();
+            const offset = y - box.top - box.height / 2;
+            
+            if (offset < 0 && offset > closest.offset) {
+                return { offset: offset, element: child };
+            } else {
+                return closest;
+            }
+        }, { offset: Number.NEGATIVE_INFINITY }).element;
+    }
+
+    toggleToolControl(controlId) {
+        const control = document.getElementById(controlId);
+        const isVisible = control.style.display !== 'none';
+        
+        // Скрываем все контролы
+        document.querySelectorAll('.tool-controls > div').forEach(ctrl => {
+            ctrl.style.display = 'none';
+        });
+        
+        // Показываем/скрываем выбранный контрол
+        if (!isVisible) {
+            control.style.display = 'block';
+        }
+    }
+
+    updateIntensity(value) {
+        document.getElementById('intensityValue').textContent = value + '%';
+        this.addChatMessage('system', `Интенсивность экспозиции установлена: ${value}%`);
+    }
+
+    selectEnvironment(environment) {
+        document.querySelectorAll('.env-btn').forEach(btn => {
+            btn.classList.remove('active');
+        });
+        event.target.classList.add('active');
+        
+        this.updateVRScene(environment);
+        this.addChatMessage('system', `Среда изменена: ${this.getEnvironmentName(environment)}`);
+    }
+
+    getEnvironmentName(environment) {
+        const names = {
+            'safe_place': 'Безопасное место',
+            'exposure_city': 'Городская среда', 
+            'exposure_nature': 'Природная среда'
+        };
+        return names[environment] || environment;
+    }
+
+    getPhaseName(phase) {
+        const phaseNames = {
+            'pre': 'Начальная оценка',
+            'during': 'Промежуточная оценка', 
+            'post': 'Финальная оценка'
+        };
+        return phaseNames[phase] || phase;
+    }
+
+    sendMessage() {
+        const input = document.getElementById('chatInput');
+        const message = input.value.trim();
+        
+        if (message && this.isSimulationActive) {
+            this.addChatMessage('therapist', message);
+            input.value = '';
+            
+            setTimeout(() => {
+                const responses = [
+                    "Понял вас, продолжаю...",
+                    "Спасибо за поддержку",
+                    "Стараюсь следовать инструкциям",
+                    "Чувствую себя немного лучше",
+                    "Пытаюсь контролировать дыхание"
+                ];
+                const randomResponse = responses[Math.floor(Math.random() * responses.length)];
+                this.addChatMessage('patient', randomResponse);
+            }, 1000);
+        }
+    }
+
+    completeSession() {
+        this.addChatMessage('system', 'Сессия завершена по таймеру');
+        this.showMessage('Сессия успешно завершена', 'success');
+        this.stopSimulation();
+    }
+
+    async emergencyStop() {
+        if (confirm('🚨 ВНИМАНИЕ: Вы уверены, что хотите экстренно остановить сессию? Это действие немедленно прекратит все стимулы и вернет пациента в безопасную среду.')) {
+            try {
+                const response = await fetch('/api/session/simulation/stop', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    }
+                });
+
+                const data = await response.json();
+                if (data.success) {
+                    this.stopSimulation();
+                    this.addChatMessage('system', '🚨 СЕССИЯ ЭКСТРЕННО ОСТАНОВЛЕНА');
+                    this.showMessage('Сессия экстренно остановлена', 'warning');
+                }
+            } catch (error) {
+                console.error('Ошибка остановки симуляции:', error);
+                this.showMessage('Ошибка остановки симуляции', 'error');
+            }
+        }
+    }
+
+    stopSimulation() {
+        this.isSimulationActive = false;
+        this.currentScenario = null;
+        this.currentPhase = null;
+        
+        // Останавливаем таймеры
+        if (this.sessionTimer) {
+            clearInterval(this.sessionTimer);
+            this.sessionTimer = null;
+        }
+        
+        this.stopVitalSignsMonitoring();
+        
+        this.updateSessionStatus('inactive');
+        this.hideSimulationControls();
+        this.resetVRScene();
+        this.resetVitalSigns();
+        
+        // Сбрасываем UI
+        document.querySelectorAll('.scenario-item').forEach(item => {
+            item.classList.remove('selected');
+        });
+        
+        document.getElementById('sessionTimer').textContent = '--:--';
+        document.getElementById('chatInput').disabled = true;
+        document.getElementById('sendMessage').disabled = true;
+        
+        // Скрываем модальное окно SUD если открыто
+        document.getElementById('sudModal').style.display = 'none';
+    }
+
+    hideSimulationControls() {
+        document.getElementById('simulationControls').style.display = 'none';
+    }
+
+    resetVRScene() {
+        document.getElementById('sceneActive').style.display = 'none';
+        document.getElementById('scenePlaceholder').style.display = 'flex';
+    }
+
+    resetVitalSigns() {
+        document.getElementById('vitalHeartRate').textContent = '--';
+        document.getElementById('vitalBloodPressure').textContent = '--/--';
+        document.getElementById('vitalTemperature').textContent = '--';
+        document.getElementById('vitalStress').textContent = '--';
+        document.getElementById('vitalRespiration').textContent = '--';
+        document.getElementById('vitalConductance').textContent = '--';
+        
+        // Сбрасываем тренды
+        document.querySelectorAll('.vital-trend').forEach(trend => {
+            trend.className = 'vital-trend';
+            trend.textContent = '';
+        });
+        
+        // Сбрасываем информацию о сессии
+        document.getElementById('currentPhase').textContent = '--';
+        document.getElementById('patientSud').textContent = '--';
+        document.getElementById('patientReactionText').textContent = '--';
+        document.getElementById('progressFill').style.width = '0%';
+        document.getElementById('progressTime').textContent = '0:00 / 3:00';
+    }
+
+    showMessage(message, type) {
+        const toast = document.createElement('div');
+        toast.className = `flash-message flash-${type}`;
+        toast.innerHTML = `
+            <i class="fas fa-${type === 'success' ? 'check-circle' : type === 'error' ? 'exclamation-circle' : 'info-circle'}"></i>
+            <span>${message}</span>
+        `;
+        
+        toast.style.position = 'fixed';
+        toast.style.top = '20px';
+        toast.style.right = '20px';
+        toast.style.zIndex = '10000';
+        toast.style.animation = 'slideInRight 0.3s ease-out';
+        
+        document.body.appendChild(toast);
+        
+        setTimeout(() => {
+            toast.style.animation = 'slideOutRight 0.3s ease-in forwards';
+            setTimeout(() => toast.remove(), 300);
+        }, 5000);
+    }
+}
+
+// Инициализация при загрузке страницы
+document.addEventListener('DOMContentLoaded', function() {
+    const root = document.querySelector('.session-control');
+    window.sessionSimulation = new SessionSimulation(root.dataset.patientId);
+});
\ No newline at end of file